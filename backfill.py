@@ -0,0 +1,209 @@
+import os
+import shutil
+import argparse
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import transformation
+import gold_transformation
+from bronze_snapshot import list_partitions
+from check_bronze import EXPECTED_SCHEMA, audit_file
+from schemas import write_table
+from versioning import link_or_copy
+
+# --- KONFIGURASI PATH ---
+BACKFILL_WORK_PATH = 'backfill_work'   # Output sementara per partisi
+# Hasil gabungan semua partisi, per layer
+HISTORY_PATHS = {
+    'silver': os.path.join(transformation.SILVER_PATH, 'history'),
+    'gold': os.path.join(gold_transformation.GOLD_PATH, 'history'),
+}
+
+SILVER_STEPS = [
+    transformation.transform_history,
+    transformation.transform_tugas,
+    transformation.transform_calendar,
+    transformation.transform_tmdb,
+]
+GOLD_STEPS = [
+    gold_transformation.create_fact_productivity,
+    gold_transformation.create_fact_genre,
+    gold_transformation.create_fact_productivity_rolling,
+    gold_transformation.create_fact_busy_time,
+    gold_transformation.create_bridge_history_tmdb,
+    gold_transformation.create_fact_productivity_rollup,
+]
+
+# File bronze per partisi. Yang hilang / kosong / rusak di satu tanggal (ingest hari itu gagal)
+# diisi dari snapshot valid terakhir sebelumnya, sama seperti path "latest" yang tetap berisi data lama.
+SOURCE_FILES = list(EXPECTED_SCHEMA)
+
+# Output wajib per partisi. Selain step yang return False, partisi juga dianggap gagal
+# kalau ada tabel yang tidak terbentuk.
+EXPECTED_OUTPUTS = {
+    'silver': ['dim_history_film', 'dim_tasks', 'dim_calendar', 'dim_tmdb_movies'],
+    'gold': [
+        'fact_daily_productivity', 'fact_genre_stats', 'fact_productivity_rolling',
+        'fact_busy_time', 'fact_free_windows', 'bridge_history_tmdb', 'fact_productivity_rollup',
+    ],
+}
+
+
+# --- 1. SUMBER BRONZE PER PARTISI (Isi hari yang bolong dari snapshot sebelumnya) ---
+def usable_source(folder, filename):
+    result = audit_file(filename, folder)
+    return result['status'] == 'ok' and result['rows'] > 0
+
+
+def resolve_sources(partitions, all_partitions):
+    """
+    Return [(tanggal, {nama_file: path_bronze})]. Sumber yang tidak layak di suatu tanggal
+    memakai snapshot layak terakhir sebelum tanggal itu (boleh di luar rentang backfill).
+    """
+    carried = {}
+    # Cari mundur dari partisi sebelum rentang, berhenti begitu semua sumber punya pengganti
+    for snapshot_date, folder in reversed([p for p in all_partitions if p[0] < partitions[0][0]]):
+        for filename in SOURCE_FILES:
+            if filename not in carried and usable_source(folder, filename):
+                carried[filename] = (snapshot_date, os.path.join(folder, filename))
+        if len(carried) == len(SOURCE_FILES):
+            break
+
+    resolved = []
+    for snapshot_date, folder in partitions:
+        sources = {}
+        for filename in SOURCE_FILES:
+            if usable_source(folder, filename):
+                carried[filename] = (snapshot_date, os.path.join(folder, filename))
+            if filename in carried:
+                source_date, sources[filename] = carried[filename]
+                if source_date != snapshot_date:
+                    print(f"   ⚠️ {snapshot_date}: {filename} hilang/kosong, pakai snapshot {source_date}")
+        resolved.append((snapshot_date, sources))
+    return resolved
+
+
+# --- 2. PROSES SATU PARTISI (Dijalankan di worker terpisah) ---
+def process_partition(snapshot_date, sources, work_path=BACKFILL_WORK_PATH):
+    """Jalankan silver + gold untuk satu snapshot bronze. Return folder output partisi."""
+    out_dir = os.path.join(work_path, f"dt={snapshot_date.isoformat()}")
+    bronze_dir = os.path.join(out_dir, 'bronze')
+    silver_dir = os.path.join(out_dir, 'silver')
+    gold_dir = os.path.join(out_dir, 'gold')
+
+    # Mulai dari folder kosong agar tidak tercampur sisa run sebelumnya
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(bronze_dir)
+    os.makedirs(silver_dir)
+    os.makedirs(gold_dir)
+    # Bronze partisi dirakit dari snapshot asli + pengganti (hard link, tanpa menyalin isi)
+    for filename, path in sources.items():
+        link_or_copy(path, os.path.join(bronze_dir, filename))
+
+    failed = [step.__name__ for step in SILVER_STEPS if not step(bronze_path=bronze_dir, silver_path=silver_dir)]
+    failed += [step.__name__ for step in GOLD_STEPS if not step(silver_path=silver_dir, gold_path=gold_dir)]
+    if failed:
+        raise RuntimeError(f"step gagal: {failed}")
+
+    missing = [
+        f"{layer}/{table_name}"
+        for layer, table_names in EXPECTED_OUTPUTS.items()
+        for table_name in table_names
+        if not os.path.exists(os.path.join(out_dir, layer, f"{table_name}.parquet"))
+    ]
+    if missing:
+        raise RuntimeError(f"tabel tidak terbentuk: {missing}")
+    return out_dir
+
+
+# --- 3. GABUNGKAN OUTPUT PARTISI (Atomik per tabel) ---
+def merge_partitions(partition_outputs, history_paths=HISTORY_PATHS):
+    """
+    Satukan output semua partisi menjadi satu tabel histori per nama file,
+    dengan kolom snapshot_date. Upsert per tanggal: hanya tanggal yang berhasil dibangun
+    ulang yang diganti, histori lama tanggal lain (termasuk partisi yang gagal) dipertahankan.
+    Tiap tabel ditulis ke .tmp lalu di-rename.
+    Dashboard baru melihatnya setelah `python versioning.py` mempublikasikan versi baru.
+    """
+    rebuilt_dates = {snapshot_date for snapshot_date, _ in partition_outputs}
+    # Kumpulkan semua file parquet per (layer, nama tabel)
+    tables = {}
+    for snapshot_date, out_dir in sorted(partition_outputs):
+        for layer in ('silver', 'gold'):
+            layer_dir = os.path.join(out_dir, layer)
+            for filename in sorted(os.listdir(layer_dir)):
+                if filename.endswith('.parquet'):
+                    tables.setdefault((layer, filename), []).append((snapshot_date, os.path.join(layer_dir, filename)))
+
+    for (layer, filename), parts in tables.items():
+        frames = []
+        for snapshot_date, path in parts:
+            df = pd.read_parquet(path)
+            df.insert(0, 'snapshot_date', snapshot_date)
+            frames.append(df)
+        target = os.path.join(history_paths[layer], filename)
+        if os.path.exists(target):
+            existing = pd.read_parquet(target)
+            snapshot_dates = pd.to_datetime(existing['snapshot_date']).dt.date
+            frames.insert(0, existing[~snapshot_dates.isin(rebuilt_dates)])
+        merged = pd.concat(frames, ignore_index=True)
+
+        table_name = filename[:-len('.parquet')]
+        write_table(merged, table_name, target, history=True)
+        print(f"   ✅ Histori: {target} ({len(merged)} baris)")
+
+
+# --- 4. BACKFILL (Paralel, satu partisi per worker) ---
+def run_backfill(start, end, workers=None):
+    partitions = list_partitions(start, end)
+    if not partitions:
+        print(f"   ⚠️ Tidak ada snapshot bronze antara {start} s/d {end}.")
+        return
+
+    workers = workers or os.cpu_count() or 1
+    print(f"   ...Memproses {len(partitions)} partisi dengan {workers} worker")
+    resolved = resolve_sources(partitions, list_partitions(end=end))
+
+    outputs = []
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(process_partition, snapshot_date, sources): snapshot_date
+            for snapshot_date, sources in resolved
+        }
+        for future in as_completed(futures):
+            snapshot_date = futures[future]
+            try:
+                outputs.append((snapshot_date, future.result()))
+            except Exception as e:
+                failed.append(snapshot_date)
+                print(f"   ❌ Gagal partisi {snapshot_date}: {e}")
+
+    # Partisi yang berhasil tetap masuk histori; tanggal yang gagal memakai histori lamanya
+    if outputs:
+        merge_partitions(outputs)
+    shutil.rmtree(BACKFILL_WORK_PATH, ignore_errors=True)
+    if failed:
+        print(f"   ❌ {len(failed)} partisi gagal ({', '.join(str(d) for d in sorted(failed))}), "
+              f"histori tanggal tersebut tidak diubah.")
+        return False
+    return True
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reprocess snapshot bronze lama lewat silver & gold.")
+    parser.add_argument('--start', type=parse_date, help="Tanggal awal (YYYY-MM-DD)")
+    parser.add_argument('--end', type=parse_date, help="Tanggal akhir (YYYY-MM-DD)")
+    parser.add_argument('--workers', type=int, default=None, help="Jumlah proses paralel (default: jumlah core)")
+    args = parser.parse_args()
+
+    print("--- ⏪ START BACKFILL HISTORICAL SNAPSHOTS ⏪ ---")
+    ok = run_backfill(args.start, args.end, args.workers)
+    print("--- FINISHED ---")
+    if ok is False:
+        raise SystemExit(1)
@@ -0,0 +1,70 @@
+import os
+import re
+import shutil
+from datetime import date, datetime, timedelta
+from versioning import atomic_write
+
+# --- KONFIGURASI PATH ---
+BRONZE_PATH = 'bronze_layer'
+SNAPSHOT_PATH = os.path.join(BRONZE_PATH, 'snapshots')
+
+# Berapa hari snapshot bronze disimpan (lebih lama = histori lebih panjang, disk lebih besar)
+RETENTION_DAYS = int(os.getenv('BRONZE_RETENTION_DAYS', '365'))
+
+# Nama folder partisi: snapshots/dt=2025-12-18/
+PARTITION_PATTERN = re.compile(r'^dt=(\d{4}-\d{2}-\d{2})$')
+
+
+def partition_dir(snapshot_date):
+    """Folder partisi untuk satu tanggal snapshot (dt=YYYY-MM-DD)."""
+    return os.path.join(SNAPSHOT_PATH, f"dt={snapshot_date.isoformat()}")
+
+
+def save_snapshot(filename, write_fn, snapshot_date=None):
+    """
+    Simpan satu file bronze ke partisi tanggal hari ini, lalu terbitkan
+    salinannya ke path lama (bronze_layer/<filename>) secara atomik.
+    write_fn(path) bertugas menulis isi file ke path yang diberikan.
+    """
+    snapshot_date = snapshot_date or date.today()
+    folder = partition_dir(snapshot_date)
+    os.makedirs(folder, exist_ok=True)
+
+    # 1. Tulis ke file sementara unik lalu rename (poller daemon & cron bisa ingest bersamaan)
+    snapshot_file = os.path.join(folder, filename)
+    atomic_write(snapshot_file, write_fn)
+
+    # 2. Path "latest" tetap dipakai transformation.py & check_bronze.py
+    latest_file = os.path.join(BRONZE_PATH, filename)
+    atomic_write(latest_file, lambda tmp_path: shutil.copy2(snapshot_file, tmp_path))
+    return snapshot_file
+
+
+def list_partitions(start=None, end=None):
+    """Daftar (tanggal, folder) snapshot yang ada, urut dari yang paling lama."""
+    if not os.path.isdir(SNAPSHOT_PATH):
+        return []
+
+    partitions = []
+    for name in os.listdir(SNAPSHOT_PATH):
+        match = PARTITION_PATTERN.match(name)
+        if not match:
+            continue
+        snapshot_date = datetime.strptime(match.group(1), '%Y-%m-%d').date()
+        if start and snapshot_date < start:
+            continue
+        if end and snapshot_date > end:
+            continue
+        partitions.append((snapshot_date, os.path.join(SNAPSHOT_PATH, name)))
+    return sorted(partitions)
+
+
+def prune_snapshots(retention_days=RETENTION_DAYS, today=None):
+    """Hapus partisi yang lebih tua dari retention_days. Return jumlah partisi yang dihapus."""
+    today = today or date.today()
+    cutoff = today - timedelta(days=retention_days)
+    removed = 0
+    for snapshot_date, folder in list_partitions(end=cutoff - timedelta(days=1)):
+        shutil.rmtree(folder, ignore_errors=True)
+        removed += 1
+    return removed
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# --- KONFIGURASI GRAFIK ---
+MAX_POINTS_PER_SERIES = 300   # Di atas ini seri di-downsample (LTTB)
+DAY_GRAIN_MAX_DAYS = 120      # Rentang <= ~4 bulan -> harian
+WEEK_GRAIN_MAX_DAYS = 730     # Rentang <= 2 tahun -> mingguan, lebih dari itu bulanan
+
+
+def choose_grain(start_date, end_date):
+    """Resolusi grafik dari panjang rentang tanggal yang dipilih."""
+    span_days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days
+    if span_days <= DAY_GRAIN_MAX_DAYS:
+        return 'day'
+    if span_days <= WEEK_GRAIN_MAX_DAYS:
+        return 'week'
+    return 'month'
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: pilih `threshold` titik yang mempertahankan
+    bentuk visual seri (puncak & lembah tetap ada). Titik pertama & terakhir selalu ikut.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)  # Bucket untuk titik tengah
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Titik acuan kanan = rata-rata bucket berikutnya (bucket terakhir = titik terakhir)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Luas segitiga (titik terpilih sebelumnya, kandidat, rata-rata bucket berikutnya)
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample_series(df, x_col, y_col, series_col, max_points=MAX_POINTS_PER_SERIES):
+    """LTTB per seri (mis. per kategori); seri yang sudah kecil dibiarkan apa adanya."""
+    parts = []
+    for _, group in df.sort_values([series_col, x_col]).groupby(series_col, observed=True, sort=False):
+        if len(group) > max_points:
+            x = group[x_col].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            group = group.iloc[lttb_indices(x, group[y_col].to_numpy(), max_points)]
+        parts.append(group)
+    return pd.concat(parts, ignore_index=True) if parts else df.iloc[0:0]
@@ -1,8 +1,43 @@
 import pandas as pd
 import json
 import os
+import re
+import csv
+import sys
+import time
+import pyarrow.parquet as pq
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
 
 BRONZE_PATH = 'bronze_layer'
+AUDIT_REPORT_PATH = os.path.join(BRONZE_PATH, '_audit_report.json')
+
+# --- SKEMA YANG DIHARAPKAN PER SUMBER ---
+# CSV: kolom header wajib | JSON: key wajib di item pertama | Parquet: kolom wajib di footer
+EXPECTED_SCHEMA = {
+    'raw_history_film.csv': {
+        'source': 'Data History (MongoDB)',
+        'required': ['Nama Film', 'Genre'],
+    },
+    'raw_tugas_kesibukan.csv': {
+        'source': 'Data Tugas (Sheets)',
+        'required': ['Nama Tugas', 'Estimasi (jam)', 'Progress ', 'Deadline', 'Kategori', 'Tipe Beban'],
+    },
+    'raw_calendar_events.json': {
+        'source': 'Data Rutinitas (Calendar)',
+        'required': ['summary', 'start', 'end'],
+    },
+    'raw_tmdb_movies.json': {
+        'source': 'Data Film (TMDB)',
+        'required': ['id', 'title', 'genre_ids', 'vote_average', 'popularity', 'release_date'],
+    },
+}
+
+CHUNK_SIZE = 8 * 1024 * 1024
+# Untuk menghitung item JSON tanpa parsing penuh
+JSON_STRING = re.compile(rb'"[^"]*"')
+JSON_INNER_GROUP = re.compile(rb'\{,*\}|\[,*\]')
+NON_STRUCTURAL = bytes(b for b in range(256) if b not in b'[]{},"')
 
 def check_csv(filename, source_name):
     path = os.path.join(BRONZE_PATH, filename)
@@ -54,7 +89,251 @@ def check_json(filename, source_name):
     except Exception as e:
         print(f"   ❌ ERROR LAIN: {e}")
 
-if __name__ == "__main__":
+# --- AUDIT CEPAT (Hanya metadata, tanpa memuat seluruh file) ---
+def count_csv_records(path):
+    """
+    Hitung record CSV per chunk (memori konstan). Newline di dalam sel ber-kutip
+    (catatan multi-baris) bukan akhir record: file dipecah di tanda kutip, segmen
+    genap = di luar kutip, ganjil = di dalam. Kutip ganda "" (escape) menghasilkan
+    segmen kosong, jadi paritasnya tetap benar. Status kutip dibawa antar chunk.
+    """
+    records = 0
+    in_quotes = False
+    last_byte = b'\n'
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            segments = chunk.split(b'"')
+            start = 1 if in_quotes else 0
+            records += sum(segment.count(b'\n') for segment in segments[start::2])
+            in_quotes ^= (len(segments) - 1) % 2 == 1
+            last_byte = chunk[-1:]
+    # Record terakhir tanpa newline tetap dihitung
+    return records + (0 if last_byte == b'\n' else 1)
+
+
+def audit_csv(path):
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f), [])
+        first_row = next(csv.reader(f), None)
+    rows = max(count_csv_records(path) - 1, 0)
+    sample = dict(zip(header, first_row)) if first_row else None
+    return {'rows': rows, 'columns': header, 'sample': sample}
+
+
+def json_skeleton(chunk):
+    """Buang isi string & semua byte non-struktur: yang tersisa hanya [ ] { } ,"""
+    # 1. Netralkan escape \\ dan \" (hanya dua escape ini yang bisa mengecoh batas string)
+    chunk = chunk.replace(b'\\\\', b'').replace(b'\\"', b'')
+    # 2. Sisakan tanda kutip + tanda struktur (translate = C, sangat cepat), lalu buang isi string
+    return JSON_STRING.sub(b'', chunk.translate(None, NON_STRUCTURAL))
+
+
+def peek_first_item(path):
+    """Decode item pertama saja dengan membaca prefix file yang membesar bertahap."""
+    decoder = json.JSONDecoder()
+    size = 64 * 1024
+    while True:
+        with open(path, 'rb') as f:
+            prefix = f.read(size).decode('utf-8', errors='ignore')
+        start = prefix.find('[') + 1
+        body = prefix[start:].lstrip()
+        if body.startswith(']'):
+            return None
+        try:
+            return decoder.raw_decode(body)[0]
+        except json.JSONDecodeError:
+            if len(prefix) < size or size >= CHUNK_SIZE * 4:
+                raise
+            size *= 4
+
+
+def scan_json_array(path):
+    """
+    Hitung item top-level sebuah JSON array secara streaming.
+    File dibaca per chunk yang dipotong di newline (newline mentah tidak mungkin ada
+    di dalam string JSON), lalu grup {..}/[..] terdalam diciutkan dengan regex
+    sampai hanya koma level-item yang tersisa. Semua kerja berat terjadi di C.
+    """
+    if os.path.getsize(path) == 0:
+        raise ValueError("File kosong (0 byte)")
+
+    commas = 0
+    carry = b''
+    pending = b''
+    started = closed = False
+
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            data = pending + chunk
+            if chunk:
+                cut = data.rfind(b'\n') + 1
+                if cut == 0:
+                    pending = data  # Belum ada newline (JSON satu baris) -> kumpulkan dulu
+                    continue
+                data, pending = data[:cut], data[cut:]
+            elif not data:
+                break
+            else:
+                pending = b''
+
+            skeleton = json_skeleton(data)
+            if not started:
+                if not skeleton:
+                    continue
+                if skeleton[:1] != b'[':
+                    raise ValueError("Top-level JSON bukan array")
+                skeleton = skeleton[1:]
+                started = True
+
+            # Ciutkan grup lengkap terdalam berulang kali (jumlah putaran = kedalaman nesting)
+            skeleton = carry + skeleton
+            while True:
+                collapsed = JSON_INNER_GROUP.sub(b'', skeleton)
+                if len(collapsed) == len(skeleton):
+                    break
+                skeleton = collapsed
+
+            # Koma di depan = pemisah antar item top-level
+            stripped = skeleton.lstrip(b',')
+            commas += len(skeleton) - len(stripped)
+            if stripped[:1] == b']':
+                if stripped[1:] or closed:
+                    raise ValueError("Ada data setelah penutup array")
+                closed = True
+                stripped = b''
+            carry = stripped
+
+            if not chunk:
+                break
+
+    if not started:
+        raise ValueError("Top-level JSON bukan array")
+    if not closed or carry:
+        raise ValueError("Struktur JSON tidak seimbang / terpotong")
+
+    first_item = peek_first_item(path)
+    items = commas + 1 if first_item is not None else 0
+    return items, first_item
+
+
+def audit_json(path):
+    items, first_item = scan_json_array(path)
+    keys = list(first_item.keys()) if isinstance(first_item, dict) else []
+    return {'rows': items, 'columns': keys, 'sample': first_item}
+
+
+def audit_parquet(path):
+    # Hanya footer: jumlah baris, skema & statistik min/max/null per row group
+    meta = pq.ParquetFile(path).metadata
+    schema = meta.schema.to_arrow_schema()
+    stats = {}
+    for rg in range(meta.num_row_groups):
+        row_group = meta.row_group(rg)
+        for col in range(row_group.num_columns):
+            column = row_group.column(col)
+            if column.statistics is None or not column.statistics.has_min_max:
+                continue
+            entry = stats.setdefault(column.path_in_schema, {'min': None, 'max': None, 'null_count': 0})
+            low, high = column.statistics.min, column.statistics.max
+            entry['min'] = low if entry['min'] is None else min(entry['min'], low)
+            entry['max'] = high if entry['max'] is None else max(entry['max'], high)
+            entry['null_count'] += column.statistics.null_count or 0
+    return {'rows': meta.num_rows, 'columns': schema.names, 'sample': None, 'statistics': stats}
+
+
+AUDITORS = {'.csv': audit_csv, '.json': audit_json, '.parquet': audit_parquet}
+
+
+def audit_file(filename, bronze_path=BRONZE_PATH):
+    path = os.path.join(bronze_path, filename)
+    expected = EXPECTED_SCHEMA.get(filename, {})
+    result = {
+        'file': filename,
+        'source': expected.get('source', 'Tidak terdaftar'),
+        'status': 'ok',
+        'errors': [],
+        'warnings': [],
+    }
+    started = time.perf_counter()
+
+    if not os.path.exists(path):
+        result['status'] = 'missing'
+        result['errors'].append('File tidak ditemukan')
+        return result
+
+    result['size_bytes'] = os.path.getsize(path)
+    try:
+        auditor = AUDITORS[os.path.splitext(filename)[1].lower()]
+        result.update(auditor(path))
+    except Exception as e:
+        result['status'] = 'corrupt'
+        result['errors'].append(str(e))
+        return result
+
+    # Validasi skema terhadap deklarasi. Array JSON kosong tidak punya item untuk dibaca kuncinya:
+    # itu kondisi valid (mis. kalender belum ada event), cukup jadi peringatan "Data kosong"
+    has_schema = result['rows'] > 0 or bool(result['columns'])
+    missing_cols = [c for c in expected.get('required', []) if c not in result['columns']] if has_schema else []
+    if missing_cols:
+        result['status'] = 'schema_drift'
+        result['errors'].append(f"Kolom/kunci hilang: {missing_cols}")
+    if result['rows'] == 0:
+        result['warnings'].append('Data kosong')
+
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def run_audit(bronze_path=BRONZE_PATH, report_path=AUDIT_REPORT_PATH, workers=None):
+    """Audit semua sumber terdaftar + file bronze lain secara paralel, lalu tulis laporan JSON."""
+    filenames = set(EXPECTED_SCHEMA)
+    if os.path.isdir(bronze_path):
+        filenames |= {
+            name for name in os.listdir(bronze_path)
+            if os.path.splitext(name)[1].lower() in AUDITORS and not name.startswith('_')
+        }
+    filenames = sorted(filenames)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(audit_file, filenames, [bronze_path] * len(filenames)))
+
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'bronze_path': bronze_path,
+        'passed': all(r['status'] == 'ok' for r in results),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        'files': results,
+    }
+    tmp_path = f"{report_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=4, default=str)
+    os.replace(tmp_path, report_path)
+    return report
+
+
+def print_audit(report):
+    for r in report['files']:
+        icon = '✅' if r['status'] == 'ok' else '❌'
+        rows = r.get('rows', '-')
+        print(f"   {icon} {r['file']:<28} {r['status']:<13} {rows} baris")
+        for msg in r['errors']:
+            print(f"      ❌ {msg}")
+        for msg in r['warnings']:
+            print(f"      ⚠️ {msg}")
+    print(f"\n   📄 Laporan: {AUDIT_REPORT_PATH} ({report['elapsed_ms']} ms)")
+
+
+if __name__ == "__main__" and '--audit' in sys.argv:
+    # Mode audit cepat untuk orkestrator: exit code 1 kalau ada file yang tidak lolos
+    print("--- ⚡ MULAI AUDIT CEPAT BRONZE LAYER (METADATA) ---")
+    report = run_audit()
+    print_audit(report)
+    print("\n--- 🏁 AUDIT SELESAI ---")
+    sys.exit(0 if report['passed'] else 1)
+
+elif __name__ == "__main__":
     print("--- 🕵️ MULAI AUDIT DATA BRONZE LAYER ---")
     
     # 1. Cek History (CSV)
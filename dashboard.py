@@ -3,6 +3,8 @@ import pandas as pd
 import plotly.express as px
 import os
 import datetime
+import versioning
+from chart_utils import choose_grain, downsample_series, MAX_POINTS_PER_SERIES
 
 # --- SESSION STATE INITIALIZATION ---
 if 'rejected_movies' not in st.session_state:
@@ -11,27 +13,54 @@ if 'rejected_movies' not in st.session_state:
 if 'accepted_movie' not in st.session_state:
     st.session_state.accepted_movie = None
 
+# Satu sesi = satu versi lakehouse (silver & gold dari run yang sama)
+if not versioning.version_exists(st.session_state.get('lakehouse_version')):
+    st.session_state.lakehouse_version = versioning.current_version()
+
 # --- PAGE CONFIGURATION ---
 st.set_page_config(page_title="Personal BI Dashboard", layout="wide")
 with st.sidebar:
     st.header("⚙️ Pengaturan")
     if st.button("🔄 Refresh Data Terbaru"):
         st.cache_data.clear()  # Hapus memori lama
+        st.session_state.lakehouse_version = versioning.current_version()  # Pin ulang ke versi terbaru
         st.rerun()
+    st.caption(f"Versi data: {st.session_state.lakehouse_version or 'belum dipublikasikan'}")
 # --- DATA LOADING FUNCTION ---
 @st.cache_data
-def load_data():
-    path_prod = 'gold_layer/fact_daily_productivity.parquet'
-    path_genre = 'gold_layer/fact_genre_stats.parquet'
-    path_tmdb = 'silver_layer/dim_tmdb_movies.parquet'
+def load_data(version):
+    path_prod = versioning.resolve_path('gold_layer/fact_daily_productivity.parquet', version)
+    path_genre = versioning.resolve_path('gold_layer/fact_genre_stats.parquet', version)
+    path_tmdb = versioning.resolve_path('silver_layer/dim_tmdb_movies.parquet', version)
+    path_rolling = versioning.resolve_path('gold_layer/fact_productivity_rolling.parquet', version)
+    path_busy = versioning.resolve_path('gold_layer/fact_busy_time.parquet', version)
+    path_bridge = versioning.resolve_path('gold_layer/bridge_history_tmdb.parquet', version)
+    path_rollup = versioning.resolve_path('gold_layer/fact_productivity_rollup.parquet', version)
 
     df_prod = pd.read_parquet(path_prod) if os.path.exists(path_prod) else None
     df_genre = pd.read_parquet(path_genre) if os.path.exists(path_genre) else None
     df_tmdb = pd.read_parquet(path_tmdb) if os.path.exists(path_tmdb) else None
+    df_busy = pd.read_parquet(path_busy) if os.path.exists(path_busy) else None
+    df_bridge = pd.read_parquet(path_bridge) if os.path.exists(path_bridge) else None
+
+    # Rollup per resolusi (day/week/month) -> dipilih saat render sesuai rentang tanggal
+    rollup_by_grain = None
+    if os.path.exists(path_rollup):
+        df_rollup = pd.read_parquet(path_rollup)
+        df_rollup['period_start'] = pd.to_datetime(df_rollup['period_start'])
+        df_rollup['category'] = df_rollup['category'].astype(str)
+        rollup_by_grain = {grain: grp.reset_index(drop=True) for grain, grp in df_rollup.groupby('grain', observed=True)}
+
+    # Index rolling per kategori (sudah urut tanggal dari gold) -> lookup cepat saat render
+    rolling_index = None
+    if os.path.exists(path_rolling):
+        df_rolling = pd.read_parquet(path_rolling)
+        df_rolling['date'] = pd.to_datetime(df_rolling['date'])  # date32 -> datetime64 untuk searchsorted
+        rolling_index = {cat: grp.reset_index(drop=True) for cat, grp in df_rolling.groupby('category', observed=True)}
     
-    return df_prod, df_genre, df_tmdb
+    return df_prod, df_genre, df_tmdb, rolling_index, df_busy, df_bridge, rollup_by_grain
 
-df_prod, df_genre, df_tmdb = load_data()
+df_prod, df_genre, df_tmdb, rolling_index, df_busy, df_bridge, rollup_by_grain = load_data(st.session_state.lakehouse_version)
 
 # --- HEADER ---
 st.title("BI Dashboard: Personal Analytics")
@@ -121,10 +150,62 @@ with tab1:
     col1.metric("Total Productive Hours", f"{total_jam:.1f} Hours")
     col2.metric("Completed Activities", f"{total_aktivitas} Items")
     
-    st.write("Daily Productivity Timeline:")
-    fig_desc = px.line(df_prod, x='date', y='total_hours', markers=True, 
-                       title="Daily Productivity Trend", line_shape='spline')
+    # Resolusi dari rentang tanggal: harian / mingguan / bulanan (rollup dari gold)
+    grain = choose_grain(start_date, end_date)
+    grain_freq = {'day': 'D', 'week': 'W-SUN', 'month': 'M'}[grain]
+    if rollup_by_grain is not None and grain in rollup_by_grain:
+        df_trend = rollup_by_grain[grain]
+        first_period = pd.Timestamp(start_date).to_period(grain_freq).start_time  # Periode yang terpotong start date tetap ikut
+        df_trend = df_trend[
+            (df_trend['period_start'] >= first_period) &
+            (df_trend['period_start'].dt.date <= end_date) &
+            (df_trend['period_start'].dt.to_period('M').astype(str).isin(selected_months))
+        ]
+        if grain == 'day':
+            df_trend = df_trend[df_trend['period_start'].dt.dayofweek.map(day_map).isin(selected_days)]
+    else:
+        # Versi data lama tanpa rollup -> agregasi dari data harian yang sudah difilter
+        df_trend = df_prod.assign(
+            period_start=df_prod['date'].dt.to_period(grain_freq).dt.start_time,
+            category=df_prod['category'].astype(str),
+        ).groupby(['period_start', 'category'], as_index=False)['total_hours'].sum()
+
+    # Batasi jumlah titik per kategori (LTTB) agar payload grafik tetap kecil
+    df_trend = downsample_series(df_trend, 'period_start', 'total_hours', 'category')
+
+    grain_label = {'day': 'Daily', 'week': 'Weekly', 'month': 'Monthly'}[grain]
+    st.write(f"{grain_label} Productivity Timeline:")
+    fig_desc = px.line(df_trend, x='period_start', y='total_hours', color='category',
+                       markers=len(df_trend) <= MAX_POINTS_PER_SERIES,
+                       title=f"{grain_label} Productivity Trend per Category",
+                       labels={'period_start': 'Period', 'total_hours': 'Hours'})
     st.plotly_chart(fig_desc, use_container_width=True)
+    if grain != 'day':
+        st.caption("Day-of-week filter applies to the daily view only; weekly/monthly totals cover whole periods.")
+
+    # --- KAPASITAS NYATA vs BEBAN TUGAS ---
+    if df_busy is not None:
+        st.write("Real Capacity vs Planned Task Load:")
+        df_capacity = df_busy.assign(date=pd.to_datetime(df_busy['date']))
+        df_capacity = df_capacity[
+            (df_capacity['date'].dt.date >= start_date) & (df_capacity['date'].dt.date <= end_date)
+        ]
+        planned = (
+            df_prod[df_prod['category'] != 'Calendar Activity']
+            .groupby('date')['total_hours'].sum()
+            .rename('planned_task_hours')
+        )
+        df_capacity = df_capacity.merge(planned, left_on='date', right_index=True, how='left').fillna({'planned_task_hours': 0})
+
+        if not df_capacity.empty:
+            df_capacity_long = df_capacity.melt(
+                id_vars='date',
+                value_vars=['busy_hours', 'free_hours', 'planned_task_hours'],
+                var_name='metric', value_name='hours'
+            )
+            fig_capacity = px.bar(df_capacity_long, x='date', y='hours', color='metric', barmode='group',
+                                  title="Calendar Busy Hours (Overlap-Free) vs Free Hours vs Planned Tasks")
+            st.plotly_chart(fig_capacity, use_container_width=True)
 
 # ==============================================================================
 # 2. DIAGNOSTIC ANALYTICS (FOCUS: PATTERNS & BEHAVIOR)
@@ -171,7 +252,7 @@ with tab2:
         st.subheader("Interest Profile")
         
         # Category Audit
-        top_cat = df_prod.groupby('category')['total_hours'].sum().sort_values(ascending=False).head(1)
+        top_cat = df_prod.groupby('category', observed=True)['total_hours'].sum().sort_values(ascending=False).head(1)
         cat_name = top_cat.index[0]
         cat_val = top_cat.values[0]
         pct_val = (cat_val / total_jam) * 100
@@ -210,6 +291,16 @@ with tab2:
         else:
             st.write("Insufficient genre data for profiling.")
 
+        # Riwayat tontonan yang berhasil dihubungkan ke TMDB (rating & popularitas)
+        if df_bridge is not None and df_tmdb is not None:
+            df_watched = df_bridge.dropna(subset=['tmdb_id']).merge(
+                df_tmdb[['id', 'vote_average', 'popularity']], left_on='tmdb_id', right_on='id', how='inner'
+            )
+            if not df_watched.empty:
+                st.write(f"{len(df_watched)} of {len(df_bridge)} watched titles matched to TMDB. "
+                         f"Average TMDB rating of what you watch: {df_watched['vote_average'].mean():.1f}/10, "
+                         f"median popularity {df_watched['popularity'].median():.0f}.")
+
 # ==============================================================================
 # 3. PREDICTIVE ANALYTICS (FOCUS: FUTURE ESTIMATION)
 # ==============================================================================
@@ -217,27 +308,37 @@ with tab3:
     st.header("Future Forecast")
     st.caption("Estimating tomorrow's output based on recent trends.")
     
-    df_sorted = df_prod.sort_values('date', ascending=False)
-    last_3_days = df_sorted.head(3)
-    avg_recent = last_3_days['total_hours'].mean()
-    last_val = df_sorted.iloc[0]['total_hours']
-    
-    prediction_status = ""
-    if last_val > avg_recent:
-        prediction_status = "RISING TREND"
-        predicted_val = avg_recent * 1.1
-        prediction_text = "You are in a positive momentum! Tomorrow's productivity is likely to remain high."
-        status_color = "green"
-    elif last_val < (avg_recent * 0.5):
-        prediction_status = "SHARP DROP"
-        predicted_val = avg_recent
-        prediction_text = "Significant energy drop detected. The system predicts tomorrow will be a recovery phase (Rebound)."
-        status_color = "red"
-    else:
+    # Ambil baris terakhir (<= End Date) dari fact rolling yang sudah dihitung di gold
+    forecast_row = None
+    if rolling_index:
+        categories = ['All'] + sorted(c for c in rolling_index if c != 'All')
+        selected_category = st.selectbox("Category:", categories)
+        df_cat = rolling_index[selected_category]
+        pos = df_cat['date'].searchsorted(pd.Timestamp(end_date), side='right') - 1
+        if pos >= 0 and df_cat['date'].iloc[pos].date() >= start_date:
+            forecast_row = df_cat.iloc[pos]
+
+    if forecast_row is None:
+        st.info("Forecast data not available for this range. Please re-run the gold pipeline.")
         prediction_status = "STABLE"
-        predicted_val = avg_recent
-        prediction_text = "Your rhythm is stable. Tomorrow is predicted to proceed normally like your daily average."
+        predicted_val = 0.0
+        avg_recent = 0.0
+        prediction_text = "Not enough recent data to estimate a trend."
         status_color = "blue"
+    else:
+        prediction_status = forecast_row['trend_status']
+        predicted_val = forecast_row['forecast_next_day']
+        avg_recent = forecast_row['rolling_3d']
+
+        if prediction_status == "RISING TREND":
+            prediction_text = "You are in a positive momentum! Tomorrow's productivity is likely to remain high."
+            status_color = "green"
+        elif prediction_status == "SHARP DROP":
+            prediction_text = "Significant energy drop detected. The system predicts tomorrow will be a recovery phase (Rebound)."
+            status_color = "red"
+        else:
+            prediction_text = "Your rhythm is stable. Tomorrow is predicted to proceed normally like your daily average."
+            status_color = "blue"
 
     col_p1, col_p2 = st.columns(2)
     with col_p1:
@@ -247,6 +348,14 @@ with tab3:
         st.metric("Target for Tomorrow", f"{predicted_val:.1f} Hours")
         st.write(f"(Based on 3-day average: {avg_recent:.1f} hours)")
 
+    if forecast_row is not None:
+        st.caption(f"As of {forecast_row['date'].date()}")
+        col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+        col_r1.metric("7-Day Average", f"{forecast_row['rolling_7d']:.1f} Hours")
+        col_r2.metric("28-Day Average", f"{forecast_row['rolling_28d']:.1f} Hours")
+        col_r3.metric("EWMA (7-Day)", f"{forecast_row['ewma_7d']:.1f} Hours")
+        col_r4.metric("Momentum (3d vs 7d)", f"{forecast_row['momentum']:+.1f} Hours")
+
 # ==============================================================================
 # 4. PRESCRIPTIVE ANALYTICS (FOCUS: DECISIONS & ACTIONS)
 # ==============================================================================
@@ -318,9 +427,13 @@ with tab4:
                 filter_logic = (df_tmdb['vote_average'] > 7.5)
                 mood_title = "Top Rated Movies (Quality Time)"
             
+            # Film yang sudah pernah ditonton (lewat bridge history <-> TMDB) tidak direkomendasikan lagi
+            watched_ids = set(df_bridge['tmdb_id'].dropna().astype(int)) if df_bridge is not None else set()
+            
             candidate_movies = df_tmdb[
                 filter_logic & 
-                (~df_tmdb['title'].isin(st.session_state.rejected_movies))
+                (~df_tmdb['title'].isin(st.session_state.rejected_movies)) &
+                (~df_tmdb['id'].isin(watched_ids))
             ].sort_values('popularity', ascending=False)
             
             if not candidate_movies.empty:
@@ -0,0 +1,171 @@
+import os
+import re
+import json
+import hashlib
+from collections import Counter, defaultdict
+from versioning import atomic_write
+
+# --- KONFIGURASI ---
+CACHE_PATH = 'cache'
+GENRE_CACHE_FILE = os.path.join(CACHE_PATH, 'genre_resolution.json')
+GENRE_UNRESOLVED_FILE = os.path.join(CACHE_PATH, 'genre_unresolved.json')
+
+# Skor kemiripan minimum (0-1) agar token typo dianggap genre kanonik
+FUZZY_THRESHOLD = float(os.getenv('GENRE_FUZZY_THRESHOLD', '0.8'))
+# Token pendek tidak di-fuzzy: satu huruf beda sudah jadi kata lain ("short" -> "sport")
+MIN_FUZZY_LENGTH = int(os.getenv('GENRE_MIN_FUZZY_LENGTH', '6'))
+MAX_CANDIDATES = 10
+
+# Pemisah antar genre: "Horor/Komedi", "Aksi; Drama", "Aksi dan Komedi", dst.
+GENRE_DELIMITERS = re.compile(r'\s*(?:[,/;|&+]|\bdan\b|\band\b)\s*', re.IGNORECASE)
+
+
+def normalize_token(token):
+    """'  Sci-Fi ' -> 'sci fi' (huruf kecil, tanda hubung jadi spasi, spasi dirapikan)."""
+    token = re.sub(r'[-_.]+', ' ', str(token).lower())
+    return re.sub(r'\s+', ' ', token).strip()
+
+
+def split_genres(genre_string):
+    return [t for t in GENRE_DELIMITERS.split(str(genre_string)) if t and t.strip()]
+
+
+def ngrams(text, n=3):
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def edit_distance(a, b):
+    """Levenshtein distance (DP dua baris)."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,                       # hapus
+                current[j - 1] + 1,                    # sisip
+                previous[j - 1] + (char_a != char_b),  # ganti
+            ))
+        previous = current
+    return previous[-1]
+
+
+def edit_similarity(a, b):
+    longest = max(len(a), len(b))
+    return 1.0 if longest == 0 else 1.0 - edit_distance(a, b) / longest
+
+
+def _dump_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4, sort_keys=True)
+
+
+class GenreResolver:
+    """
+    Resolver genre: exact match ke GENRE_MAP dulu, kalau tidak ada baru fuzzy
+    (index trigram + edit distance). Setiap keputusan fuzzy disimpan di cache
+    persisten, jadi satu token mentah hanya di-fuzzy-match sekali selamanya.
+    """
+
+    def __init__(self, genre_map, cache_file=GENRE_CACHE_FILE, threshold=FUZZY_THRESHOLD,
+                 min_fuzzy_length=MIN_FUZZY_LENGTH):
+        self.cache_file = cache_file
+        self.threshold = threshold
+        self.min_fuzzy_length = min_fuzzy_length
+
+        # 1. Index exact: semua alias + nama kanonik itu sendiri, dalam bentuk ternormalisasi
+        self.exact = {normalize_token(alias): canonical for alias, canonical in genre_map.items()}
+        for canonical in set(genre_map.values()):
+            self.exact.setdefault(normalize_token(canonical), canonical)
+
+        # 2. Index trigram -> alias, untuk menyaring kandidat fuzzy
+        self.ngram_index = defaultdict(set)
+        for alias in self.exact:
+            for gram in ngrams(alias):
+                self.ngram_index[gram].add(alias)
+
+        # Cache lama tidak berlaku kalau kamus / threshold / panjang minimum berubah
+        fingerprint = json.dumps([sorted(self.exact.items()), threshold, min_fuzzy_length])
+        self.fingerprint = hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+        self.cache = self._load_cache()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Mulai hitungan baru (dipanggil tiap run; resolver hidup lama di dalam daemon)."""
+        self.unresolved = Counter()
+        self.fuzzy_lookups = 0
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            if data.get('fingerprint') == self.fingerprint:
+                return data.get('tokens', {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return {}
+
+    def save(self):
+        # Gabung dengan isi disk terbaru: proses lain (worker backfill, daemon) bisa menyimpan
+        # keputusan baru sejak cache ini dibaca. Nama .tmp unik lewat atomic_write.
+        tokens = {**self._load_cache(), **self.cache}
+        payload = {'fingerprint': self.fingerprint, 'tokens': tokens}
+        atomic_write(self.cache_file, lambda tmp_file: _dump_json(tmp_file, payload))
+
+    def _fuzzy_match(self, token):
+        if len(token) < self.min_fuzzy_length:
+            return {'genre': None, 'matched': None, 'score': 0.0}
+
+        # Kandidat = alias dengan trigram bersama terbanyak; hanya itu yang dihitung edit distance-nya
+        shared = Counter()
+        for gram in ngrams(token):
+            for alias in self.ngram_index.get(gram, ()):
+                shared[alias] += 1
+
+        best_alias, best_score = None, 0.0
+        for alias, _ in shared.most_common(MAX_CANDIDATES):
+            score = edit_similarity(token, alias)
+            if score > best_score:
+                best_alias, best_score = alias, score
+
+        if best_alias is not None and best_score >= self.threshold:
+            return {'genre': self.exact[best_alias], 'matched': best_alias, 'score': round(best_score, 3)}
+        return {'genre': None, 'matched': best_alias, 'score': round(best_score, 3)}
+
+    def resolve_token(self, raw_token):
+        """Return genre kanonik, atau None kalau tidak bisa di-resolve."""
+        token = normalize_token(raw_token)
+        if not token:
+            return None
+        if token in self.exact:
+            return self.exact[token]
+
+        decision = self.cache.get(token)
+        if decision is None:
+            self.fuzzy_lookups += 1
+            decision = self._fuzzy_match(token)
+            self.cache[token] = decision
+
+        if decision['genre'] is None:
+            self.unresolved[token] += 1
+        return decision['genre']
+
+    def resolve(self, genre_string):
+        """'horor/komedy, Aksi' -> ['Action', 'Comedy', 'Horror'] (unik & urut)."""
+        genres = set()
+        for raw_token in split_genres(genre_string):
+            # Token yang tidak dikenal tetap dipakai seperti perilaku lama (Title Case)
+            genres.add(self.resolve_token(raw_token) or normalize_token(raw_token).title())
+        return sorted(genres)
+
+    def write_unresolved_report(self, report_file=GENRE_UNRESOLVED_FILE):
+        report = [
+            {'token': token, 'count': count,
+             'closest': self.cache.get(token, {}).get('matched'),
+             'score': self.cache.get(token, {}).get('score')}
+            for token, count in self.unresolved.most_common()
+        ]
+        atomic_write(report_file, lambda tmp_file: _dump_json(tmp_file, report))
+        return report
@@ -1,21 +1,33 @@
 import pandas as pd
+import numpy as np
 import os
+import json
+import sys
+import time
+from schemas import write_table
+from versioning import atomic_write, pipeline_lock
+from title_matcher import TitleIndex, normalize_title, number_tokens
 
 # --- KONFIGURASI PATH ---
 SILVER_PATH = 'silver_layer'
 GOLD_PATH = 'gold_layer'
+BRIDGE_REPORT_FILE = os.path.join('cache', 'bridge_match_report.json')
+
+# Zona waktu pengguna (batas hari untuk kalender). Default WITA.
+USER_TIMEZONE = os.getenv('USER_TIMEZONE', 'Asia/Makassar')
 
 # Buat folder gold jika belum ada
 os.makedirs(GOLD_PATH, exist_ok=True)
 
 # --- 1. MEMBUAT FACT PRODUCTIVITY (Gabungan Calendar & Tugas) ---
 
-def create_fact_productivity():
-    print("\n[1/2] Gold: Creating Fact Productivity...")
+def create_fact_productivity(silver_path=SILVER_PATH, gold_path=GOLD_PATH):
+    print("\n[1/6] Gold: Creating Fact Productivity...")
     try:
         # Load Data Silver
-        df_cal = pd.read_parquet(f"{SILVER_PATH}/dim_calendar.parquet")
-        df_task = pd.read_parquet(f"{SILVER_PATH}/dim_tasks.parquet")
+        df_cal = pd.read_parquet(f"{silver_path}/dim_calendar.parquet")
+        df_task = pd.read_parquet(f"{silver_path}/dim_tasks.parquet")
+        df_task['deadline_clean'] = pd.to_datetime(df_task['deadline_clean'])  # date32 -> Timestamp
 
         # --- A. OLAH DATA CALENDAR (TETAP: Jangan Dibagi) ---
         df_cal['duration_hours'] = (df_cal['end_time'] - df_cal['start_time']).dt.total_seconds() / 3600
@@ -91,20 +103,22 @@ def create_fact_productivity():
         fact_daily = fact_daily.sort_values('date')
 
         # Simpan
-        output = f"{GOLD_PATH}/fact_daily_productivity.parquet"
-        fact_daily.to_parquet(output, index=False)
+        output = f"{gold_path}/fact_daily_productivity.parquet"
+        write_table(fact_daily, 'fact_daily_productivity', output)
         print(f"   ✅ Sukses: Data produktivitas disimpan.")
         print(f"      Hanya 'Akademik' > 20 jam yang disebar. Non-Akademik tetap utuh.")
         print(f"   👀 Preview:\n{fact_daily.head(3)}")
+        return True
 
     except Exception as e:
         print(f"   ❌ Gagal Productivity: {e}")
+        return False
 
 # --- 2. MEMBUAT FACT GENRE (Analisa Tontonan) ---
-def create_fact_genre():
-    print("\n[2/2] Gold: Creating Fact Genre Analytics...")
+def create_fact_genre(silver_path=SILVER_PATH, gold_path=GOLD_PATH):
+    print("\n[2/6] Gold: Creating Fact Genre Analytics...")
     try:
-        df_film = pd.read_parquet(f"{SILVER_PATH}/dim_history_film.parquet")
+        df_film = pd.read_parquet(f"{silver_path}/dim_history_film.parquet")
 
         # 1. Split string menjadi List
         df_film['genre_list'] = df_film['genres'].str.split(', ')
@@ -124,16 +138,326 @@ def create_fact_genre():
         fact_genre = fact_genre.sort_values('total_watched', ascending=False)
 
         # Simpan
-        output = f"{GOLD_PATH}/fact_genre_stats.parquet"
-        fact_genre.to_parquet(output, index=False)
+        output = f"{gold_path}/fact_genre_stats.parquet"
+        write_table(fact_genre, 'fact_genre_stats', output)
         print(f"   ✅ Sukses: Statistik Genre disimpan ke {output}")
         print(f"   👀 Top 3 Genre:\n{fact_genre.head(3)}")
+        return True
 
     except Exception as e:
         print(f"   ❌ Gagal Genre: {e}")
+        return False
+
+# --- 3. MEMBUAT FACT ROLLING (Bahan Tab Forecast, dihitung sekali per run) ---
+ROLLING_WINDOWS = [3, 7, 28]
+EWMA_SPAN = 7
+
+def create_fact_productivity_rolling(silver_path=SILVER_PATH, gold_path=GOLD_PATH):
+    print("\n[3/6] Gold: Creating Fact Productivity Rolling...")
+    try:
+        df = pd.read_parquet(f"{gold_path}/fact_daily_productivity.parquet")
+        df['date'] = pd.to_datetime(df['date'])
+        df['category'] = df['category'].astype(str)  # dictionary/categorical -> string biasa
+
+        # 1. Tabel lebar: baris = tanggal (harian lengkap), kolom = kategori + 'All'
+        wide = df.pivot_table(index='date', columns='category', values='total_hours', aggfunc='sum')
+        wide['All'] = wide.sum(axis=1)
+        full_range = pd.date_range(wide.index.min(), wide.index.max(), freq='D')
+        wide = wide.reindex(full_range).fillna(0.0)  # Hari tanpa aktivitas = 0 jam
+        wide.index.name = 'date'
+        wide.columns.name = 'category'
+
+        # 2. Rolling & EWMA untuk semua kategori sekaligus (vectorized per kolom)
+        features = {'total_hours': wide}
+        for window in ROLLING_WINDOWS:
+            features[f'rolling_{window}d'] = wide.rolling(window, min_periods=1).mean()
+        features[f'ewma_{EWMA_SPAN}d'] = wide.ewm(span=EWMA_SPAN, adjust=False).mean()
+
+        # 3. Kembali ke bentuk panjang: satu baris per (tanggal, kategori)
+        fact_rolling = pd.concat({name: frame.stack() for name, frame in features.items()}, axis=1).reset_index()
+
+        # 4. Momentum & status tren (logika sama seperti Tab 3 dashboard, tapi per kategori)
+        hours = fact_rolling['total_hours']
+        avg_3d = fact_rolling['rolling_3d']
+        fact_rolling['momentum'] = avg_3d - fact_rolling['rolling_7d']
+        rising = hours > avg_3d
+        sharp_drop = hours < (avg_3d * 0.5)
+        fact_rolling['trend_status'] = np.select([rising, sharp_drop], ['RISING TREND', 'SHARP DROP'], default='STABLE')
+        fact_rolling['forecast_next_day'] = np.where(rising, avg_3d * 1.1, avg_3d)
+
+        fact_rolling = fact_rolling.sort_values(['category', 'date']).reset_index(drop=True)
+
+        # Simpan
+        output = f"{gold_path}/fact_productivity_rolling.parquet"
+        write_table(fact_rolling, 'fact_productivity_rolling', output)
+        print(f"   ✅ Sukses: {len(fact_rolling)} baris rolling ({wide.shape[1]} kategori) disimpan ke {output}")
+        return True
+
+    except Exception as e:
+        print(f"   ❌ Gagal Rolling: {e}")
+        return False
+
+# --- 4. MEMBUAT FACT BUSY TIME (Jam sibuk nyata dari kalender, tanpa hitung ganda) ---
+ONE_DAY = np.timedelta64(1, 'D')
+MIN_FREE_MINUTES = 15
+
+def calendar_local_intervals(df_cal, tz=USER_TIMEZONE):
+    """Start/end kalender sebagai datetime64 lokal (naive) di zona waktu pengguna."""
+    start_utc = df_cal['start_time']
+    end_utc = df_cal['end_time']
+    start_local = start_utc.dt.tz_convert(tz).dt.tz_localize(None)
+    end_local = end_utc.dt.tz_convert(tz).dt.tz_localize(None)
+
+    # Event seharian disimpan silver sebagai tengah malam UTC -> artinya tengah malam lokal
+    if 'is_all_day' in df_cal.columns:
+        all_day = df_cal['is_all_day'].fillna(False).to_numpy(dtype=bool)
+        start_local = start_local.where(~all_day, start_utc.dt.tz_localize(None))
+        end_local = end_local.where(~all_day, end_utc.dt.tz_localize(None))
+
+    starts = start_local.to_numpy(dtype='datetime64[ns]')
+    ends = end_local.to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(starts) & ~np.isnat(ends) & (ends > starts)
+    return starts[valid], ends[valid]
+
+
+def merge_intervals(starts, ends):
+    """Gabungkan interval yang overlap/nested dengan sorted sweep: O(n log n)."""
+    if len(starts) == 0:
+        return starts, ends
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+
+    # Blok baru dimulai kalau start > end terjauh dari semua interval sebelumnya
+    running_end = np.maximum.accumulate(ends)
+    new_block = np.empty(len(starts), dtype=bool)
+    new_block[0] = True
+    new_block[1:] = starts[1:] > running_end[:-1]
+
+    first = np.flatnonzero(new_block)
+    last = np.append(first[1:] - 1, len(starts) - 1)
+    return starts[first], running_end[last]
+
+
+def split_at_day_boundaries(starts, ends):
+    """Pecah tiap interval di tengah malam -> (tanggal, start potongan, end potongan)."""
+    first_day = starts.astype('datetime64[D]')
+    last_day = (ends - np.timedelta64(1, 'ns')).astype('datetime64[D]')  # end eksklusif
+    n_days = (last_day - first_day).astype(np.int64) + 1
+
+    owner = np.repeat(np.arange(len(starts)), n_days)
+    day_offset = np.arange(n_days.sum()) - np.repeat(np.cumsum(n_days) - n_days, n_days)
+    days = first_day[owner] + day_offset.astype('timedelta64[D]')
+
+    day_start = days.astype('datetime64[ns]')
+    piece_start = np.maximum(starts[owner], day_start)
+    piece_end = np.minimum(ends[owner], day_start + ONE_DAY)
+    return days, piece_start, piece_end
+
+
+def create_fact_busy_time(silver_path=SILVER_PATH, gold_path=GOLD_PATH):
+    print("\n[4/6] Gold: Creating Fact Busy Time & Free Windows...")
+    try:
+        df_cal = pd.read_parquet(f"{silver_path}/dim_calendar.parquet")
+        starts, ends = calendar_local_intervals(df_cal)
+        if len(starts) == 0:
+            print("   ⚠️ Tidak ada interval kalender yang valid.")
+            return True
+
+        hour = np.timedelta64(1, 'h')
+
+        # 1. Jam terjadwal mentah (masih dobel kalau overlap) vs jam sibuk nyata (sudah di-merge)
+        raw_days, raw_start, raw_end = split_at_day_boundaries(starts, ends)
+        merged_start, merged_end = merge_intervals(starts, ends)
+        days, piece_start, piece_end = split_at_day_boundaries(merged_start, merged_end)
+
+        scheduled = pd.Series((raw_end - raw_start) / hour).groupby(raw_days).sum()
+        pieces = pd.DataFrame({
+            'date': days,
+            'piece_start': piece_start,
+            'piece_end': piece_end,
+            'busy_hours': (piece_end - piece_start) / hour,
+        })
+
+        # 2. Free windows: celah sebelum, di antara, dan sesudah potongan sibuk dalam hari yang sama
+        day_start = days.astype('datetime64[ns]')
+        same_day_as_prev = np.r_[False, days[1:] == days[:-1]]
+        same_day_as_next = np.r_[days[:-1] == days[1:], False]
+        prev_end = np.r_[day_start[:1], piece_end[:-1]]
+        gap_before_start = np.where(same_day_as_prev, prev_end, day_start)
+        trailing = ~same_day_as_next
+
+        all_day_index = pd.date_range(days.min(), days.max(), freq='D').to_numpy(dtype='datetime64[D]')
+        empty_days = np.setdiff1d(all_day_index, days)
+
+        windows = pd.DataFrame({
+            'date': np.concatenate([days, days[trailing], empty_days]),
+            'window_start': np.concatenate([gap_before_start, piece_end[trailing], empty_days.astype('datetime64[ns]')]),
+            'window_end': np.concatenate([
+                piece_start,
+                day_start[trailing] + ONE_DAY,
+                empty_days.astype('datetime64[ns]') + ONE_DAY,
+            ]),
+        })
+        windows['free_hours'] = (windows['window_end'] - windows['window_start']) / pd.Timedelta(hours=1)
+        windows = windows[windows['free_hours'] * 60 >= MIN_FREE_MINUTES]
+        windows = windows.sort_values('window_start').reset_index(drop=True)
+
+        # 3. Ringkasan harian
+        fact_busy = pieces.groupby('date').agg(
+            busy_hours=('busy_hours', 'sum'),
+            busy_blocks=('busy_hours', 'count'),
+        ).reindex(all_day_index, fill_value=0)
+        fact_busy.index.name = 'date'
+        fact_busy['scheduled_hours'] = scheduled.reindex(all_day_index, fill_value=0).to_numpy()
+        fact_busy['overlap_hours'] = fact_busy['scheduled_hours'] - fact_busy['busy_hours']
+        fact_busy['free_hours'] = 24 - fact_busy['busy_hours']
+        fact_busy['longest_free_hours'] = windows.groupby('date')['free_hours'].max().reindex(all_day_index, fill_value=0).to_numpy()
+        fact_busy = fact_busy.reset_index()
+        fact_busy['date'] = fact_busy['date'].dt.date
+        windows['date'] = pd.to_datetime(windows['date']).dt.date
+
+        # Simpan
+        write_table(fact_busy, 'fact_busy_time', f"{gold_path}/fact_busy_time.parquet")
+        write_table(windows, 'fact_free_windows', f"{gold_path}/fact_free_windows.parquet")
+        print(f"   ✅ Sukses: {len(starts)} event -> {len(merged_start)} blok sibuk, {len(fact_busy)} hari ({USER_TIMEZONE}).")
+        print(f"      Overlap yang tidak lagi dihitung ganda: {fact_busy['overlap_hours'].sum():.1f} jam")
+        return True
+
+    except Exception as e:
+        print(f"   ❌ Gagal Busy Time: {e}")
+        return False
+
+# --- 5. MEMBUAT BRIDGE HISTORY <-> TMDB (Judul yang ditonton -> film TMDB) ---
+BRIDGE_COLUMNS = ['title', 'title_key', 'tmdb_id', 'tmdb_title', 'match_type', 'match_score']
+
+def _dump_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+def bridge_report_file(gold_path):
+    """Pipeline utama -> cache/, backfill -> backfill_work/dt=.../ (worker tidak menimpa laporan live)."""
+    base_path = os.path.dirname(os.path.normpath(gold_path))
+    return os.path.join(base_path, os.path.basename(BRIDGE_REPORT_FILE)) if base_path else BRIDGE_REPORT_FILE
+
+def create_bridge_history_tmdb(silver_path=SILVER_PATH, gold_path=GOLD_PATH):
+    print("\n[5/6] Gold: Creating Bridge History <-> TMDB...")
+    try:
+        started = time.perf_counter()
+        df_film = pd.read_parquet(f"{silver_path}/dim_history_film.parquet", columns=['title'])
+        df_tmdb = pd.read_parquet(f"{silver_path}/dim_tmdb_movies.parquet", columns=['id', 'title', 'release_date', 'popularity'])
+        titles = df_film['title'].dropna().unique()
+        output = f"{gold_path}/bridge_history_tmdb.parquet"
+
+        # 1. Pakai ulang hasil run sebelumnya: judul yang sudah match & film TMDB-nya masih ada
+        previous = pd.DataFrame(columns=BRIDGE_COLUMNS)
+        if os.path.exists(output):
+            previous = pd.read_parquet(output)
+            previous['match_type'] = previous['match_type'].astype(str)
+            # Fuzzy lama yang nomor sekuelnya beda ("Avatar 2" -> "Avatar 5") dicocokkan ulang
+            same_numbers = np.array([
+                match_type != 'fuzzy' or number_tokens(key) == number_tokens(normalize_title(tmdb_title)[0])
+                for key, tmdb_title, match_type in zip(previous['title_key'], previous['tmdb_title'], previous['match_type'])
+            ], dtype=bool)
+            still_valid = (
+                previous['title'].isin(titles)
+                & (previous['match_type'] != 'unmatched')
+                & previous['tmdb_id'].isin(df_tmdb['id'])
+                & same_numbers
+            )
+            previous = previous[still_valid]
+
+        # 2. Hanya judul baru + yang dulu belum match (katalog TMDB bisa saja bertambah)
+        done = set(previous['title'])
+        todo = [title for title in titles if title not in done]
+        comparisons = 0
+        fresh = []
+        if todo:
+            index = TitleIndex(df_tmdb.to_dict('records'))
+            fresh = [{'title': title, **index.match(title)} for title in todo]
+            comparisons = index.comparisons
+
+        bridge = pd.DataFrame(previous.to_dict('records') + fresh, columns=BRIDGE_COLUMNS)
+        bridge['tmdb_id'] = bridge['tmdb_id'].astype('Int32')
+        bridge['match_score'] = bridge['match_score'].astype(float)
+        write_table(bridge, 'bridge_history_tmdb', output)
+        elapsed = time.perf_counter() - started
+
+        # 3. Laporan kualitas match
+        counts = bridge['match_type'].astype(str).value_counts()
+        report = {
+            'total_titles': int(len(bridge)),
+            'exact': int(counts.get('exact', 0)),
+            'fuzzy': int(counts.get('fuzzy', 0)),
+            'unmatched': int(counts.get('unmatched', 0)),
+            'reused': int(len(previous)),
+            'matched_this_run': len(todo),
+            'fuzzy_comparisons': comparisons,
+            'seconds': round(elapsed, 3),
+            'unmatched_titles': bridge.loc[bridge['match_type'].astype(str) == 'unmatched', 'title'].head(50).tolist(),
+        }
+        atomic_write(bridge_report_file(gold_path), lambda tmp_path: _dump_json(tmp_path, report))
+
+        match_rate = (report['exact'] + report['fuzzy']) / max(report['total_titles'], 1) * 100
+        print(f"   ✅ Sukses: {report['total_titles']} judul -> exact {report['exact']}, fuzzy {report['fuzzy']}, "
+              f"tidak cocok {report['unmatched']} ({match_rate:.0f}% match)")
+        print(f"      {len(todo)} judul diproses ulang, {report['reused']} dipakai ulang, "
+              f"{comparisons} perbandingan fuzzy, {elapsed:.2f} detik")
+        return True
+
+    except Exception as e:
+        print(f"   ❌ Gagal Bridge: {e}")
+        return False
+
+# --- 6. MEMBUAT FACT ROLLUP (Harian / Mingguan / Bulanan untuk grafik dashboard) ---
+ROLLUP_GRAINS = {'day': 'D', 'week': 'W-SUN', 'month': 'M'}  # Minggu = Senin s/d Minggu
+
+def create_fact_productivity_rollup(silver_path=SILVER_PATH, gold_path=GOLD_PATH):
+    print("\n[6/6] Gold: Creating Fact Productivity Rollup...")
+    try:
+        df = pd.read_parquet(f"{gold_path}/fact_daily_productivity.parquet")
+        df['date'] = pd.to_datetime(df['date'])
+        df['category'] = df['category'].astype(str)
+
+        rollups = []
+        for grain, freq in ROLLUP_GRAINS.items():
+            period_start = df['date'].dt.to_period(freq).dt.start_time
+            rollup = df.assign(period_start=period_start).groupby(['period_start', 'category']).agg(
+                total_hours=('total_hours', 'sum'),
+                total_activities=('total_activities', 'sum'),
+                active_days=('date', 'nunique'),
+            ).reset_index()
+            rollup['grain'] = grain
+            rollups.append(rollup)
+
+        fact_rollup = pd.concat(rollups, ignore_index=True)[
+            ['grain', 'period_start', 'category', 'total_hours', 'total_activities', 'active_days']
+        ]
+
+        # Simpan
+        output = f"{gold_path}/fact_productivity_rollup.parquet"
+        write_table(fact_rollup, 'fact_productivity_rollup', output)
+        sizes = fact_rollup['grain'].value_counts()
+        print(f"   ✅ Sukses: rollup {', '.join(f'{g} {sizes.get(g, 0)}' for g in ROLLUP_GRAINS)} baris disimpan ke {output}")
+        return True
+
+    except Exception as e:
+        print(f"   ❌ Gagal Rollup: {e}")
+        return False
 
 if __name__ == "__main__":
     print("--- 🥇 START GOLD LAYER TRANSFORMATION 🥇 ---")
-    create_fact_productivity()
-    create_fact_genre()
-    print("--- FINISHED ---")
\ No newline at end of file
+    # Jangan bentrok dengan daemon / run lain yang sedang menulis layer yang sama
+    with pipeline_lock():
+        results = [
+            create_fact_productivity(),
+            create_fact_genre(),
+            create_fact_productivity_rolling(),
+            create_fact_busy_time(),
+            create_bridge_history_tmdb(),
+            create_fact_productivity_rollup(),
+        ]
+    print("--- FINISHED ---")
+    # Exit code != 0 agar run_pipeline.sh berhenti sebelum publish
+    if not all(results):
+        print(f"❌ {results.count(False)} langkah gold gagal.")
+        sys.exit(1)
\ No newline at end of file
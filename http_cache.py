@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import requests
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from versioning import atomic_write
+
+# --- KONFIGURASI ---
+HTTP_CACHE_PATH = os.path.join('cache', 'http')
+HTTP_FIXTURE_PATH = os.path.join('fixtures', 'http')
+HTTP_CACHE_TTL = int(os.getenv('HTTP_CACHE_TTL_SECONDS', str(6 * 3600)))
+HTTP_CACHE_MAX_BYTES = int(os.getenv('HTTP_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+# cache  : pakai cache (TTL + revalidasi), network kalau perlu
+# record : selalu ke network, simpan juga sebagai fixture untuk replay
+# replay : TANPA network sama sekali, hanya dari fixture (untuk test & benchmark offline)
+# off    : tanpa cache (perilaku lama)
+HTTP_CACHE_MODE = os.getenv('HTTP_CACHE_MODE', 'cache')
+
+# Parameter rahasia tidak boleh masuk kunci cache maupun file fixture
+SECRET_PARAMS = {'api_key', 'apikey', 'key', 'token', 'access_token'}
+KEPT_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'Date', 'Cache-Control']
+
+
+def normalize_url(url, params=None):
+    """URL kanonik tanpa API key: skema/host huruf kecil, query diurutkan."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += [(k, str(v)) for k, v in params.items() if v is not None]
+    query = sorted((k, v) for k, v in query if k.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', urlencode(query), ''))
+
+
+def cache_key(normalized_url):
+    return hashlib.sha256(normalized_url.encode('utf-8')).hexdigest()
+
+
+def _dump_entry(path, entry):
+    with open(path, 'w') as f:
+        json.dump(entry, f)
+
+
+class CachedResponse:
+    """Pengganti requests.Response yang cukup untuk ingestion (status_code, headers, json())."""
+
+    def __init__(self, status_code, headers, text, from_cache=False):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        self.from_cache = from_cache
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class HttpCache:
+    def __init__(self, cache_dir=HTTP_CACHE_PATH, fixture_dir=HTTP_FIXTURE_PATH,
+                 ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES, mode=HTTP_CACHE_MODE, session=None):
+        if mode not in ('cache', 'record', 'replay', 'off'):
+            raise ValueError(f"HTTP_CACHE_MODE tidak dikenal: {mode}")
+        self.cache_dir = cache_dir
+        self.fixture_dir = fixture_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.session = session or requests.Session()
+        self.stats = {'hit': 0, 'revalidated': 0, 'miss': 0, 'network': 0}
+
+    # --- Penyimpanan entry (satu file JSON per URL) ---
+    def _entry_path(self, folder, key):
+        return os.path.join(folder, key[:2], f"{key}.json")
+
+    def _load(self, folder, key):
+        try:
+            with open(self._entry_path(folder, key), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _save(self, folder, key, entry):
+        # Temp file unik: poller TMDB daemon & ingestion cron bisa menyimpan URL yang sama bersamaan
+        atomic_write(self._entry_path(folder, key), lambda tmp_path: _dump_entry(tmp_path, entry))
+
+    def _touch(self, key):
+        # mtime = waktu akses terakhir -> dasar eviksi LRU
+        try:
+            os.utime(self._entry_path(self.cache_dir, key))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _response(entry, from_cache):
+        return CachedResponse(entry['status_code'], entry['headers'], entry['body'], from_cache=from_cache)
+
+    # --- API utama ---
+    def get(self, url, params=None, timeout=30):
+        normalized = normalize_url(url, params)
+        key = cache_key(normalized)
+
+        if self.mode == 'replay':
+            entry = self._load(self.fixture_dir, key)
+            if entry is None:
+                raise LookupError(f"Fixture tidak ditemukan untuk {normalized}")
+            self.stats['hit'] += 1
+            return self._response(entry, from_cache=True)
+
+        entry = self._load(self.cache_dir, key) if self.mode == 'cache' else None
+
+        # 1. Masih dalam TTL -> tanpa network sama sekali
+        if entry and time.time() - entry['fetched_at'] < self.ttl:
+            self._touch(key)
+            self.stats['hit'] += 1
+            return self._response(entry, from_cache=True)
+
+        # 2. Kedaluwarsa -> revalidasi bersyarat (ETag / Last-Modified)
+        headers = {}
+        if entry:
+            if entry['headers'].get('ETag'):
+                headers['If-None-Match'] = entry['headers']['ETag']
+            if entry['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+        resp = self.session.get(url, params=params, headers=headers, timeout=timeout)
+        self.stats['network'] += 1
+
+        if resp.status_code == 304 and entry:
+            entry['fetched_at'] = time.time()
+            self._save(self.cache_dir, key, entry)
+            self.stats['revalidated'] += 1
+            return self._response(entry, from_cache=True)
+
+        self.stats['miss'] += 1
+        entry = {
+            'url': normalized,
+            'status_code': resp.status_code,
+            'headers': {h: resp.headers[h] for h in KEPT_HEADERS if h in resp.headers},
+            'body': resp.text,
+            'fetched_at': time.time(),
+        }
+        if resp.status_code == 200:
+            if self.mode == 'cache':
+                self._save(self.cache_dir, key, entry)  # Eviksi sekali per run (evict()), bukan per halaman
+            elif self.mode == 'record':
+                self._save(self.fixture_dir, key, entry)
+        return self._response(entry, from_cache=False)
+
+    def evict(self):
+        """Hapus entry yang paling lama tidak diakses sampai total ukuran <= max_bytes."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith('.json'):
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue  # Sudah dihapus proses lain
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return removed
+
+    def summary(self):
+        s = self.stats
+        return f"cache hit {s['hit']}, revalidasi 304 {s['revalidated']}, miss {s['miss']}, panggilan network {s['network']}"
+
+
+if __name__ == "__main__":
+    # python http_cache.py evict  -> rapikan cache sesuai HTTP_CACHE_MAX_BYTES
+    if len(sys.argv) > 1 and sys.argv[1] == 'evict':
+        print(f"🧹 {HttpCache().evict()} entry cache HTTP dihapus.")
+    else:
+        print("Pemakaian: python http_cache.py evict")
@@ -1,13 +1,15 @@
 import os
 import json
 import pandas as pd
-import requests
 import gspread
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 from pymongo import MongoClient
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 from dotenv import load_dotenv
+from bronze_snapshot import save_snapshot, prune_snapshots, partition_dir, RETENTION_DAYS
+from http_cache import HttpCache
+from sheets_incremental import sync_worksheet
 
 load_dotenv()
 
@@ -20,6 +22,10 @@ SHEET_TUGAS_NAME = "Data Kesibukan"
 # Pastikan folder ada
 os.makedirs(BRONZE_PATH, exist_ok=True)
 
+def write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
 # 1. Ingest MongoDB (History)
 def ingest_mongodb():
     print("\n[1/4] Ingest: MongoDB (History) -> CSV Bronze...")
@@ -30,12 +36,11 @@ def ingest_mongodb():
         collection = db["watch_history"]
         
         # Ambil semua data
-        data = list(collection.find({}, {'_id': 0}))
+        data = list(collection.find({}, {'_id': 0, '_row': 0}))
         
         if len(data) > 0:
             df = pd.DataFrame(data)
-            output = f"{BRONZE_PATH}/raw_history_film.csv"
-            df.to_csv(output, index=False)
+            output = save_snapshot("raw_history_film.csv", lambda path: df.to_csv(path, index=False))
             print(f"   ✅ Tersimpan: {output} ({len(df)} baris)")
         else:
             print("   ⚠️ Data MongoDB Kosong. Cek seed_nosql.py!")
@@ -55,11 +60,20 @@ def ingest_sheets_tugas():
         client = gspread.authorize(creds)
         
         sheet = client.open(SHEET_TUGAS_NAME).sheet1
-        data = sheet.get_all_records()
-        df = pd.DataFrame(data)
+        # Hanya baris baru / berubah yang diunduh; sisanya dari store bronze/_sheets
+        sync = sync_worksheet(sheet, "tugas_kesibukan", commit=False)
+        print(f"   ...Sync sheet: {sync.summary()}")
+        
+        # Sheet tidak berubah -> cukup pastikan partisi hari ini punya CSV (backfill butuh tiap tanggal)
+        snapshot_today = os.path.join(partition_dir(date.today()), "raw_tugas_kesibukan.csv")
+        if sync.mode == 'unchanged' and os.path.exists(snapshot_today):
+            print("   ⏭️ Sheet tidak berubah sejak sync terakhir, snapshot hari ini sudah ada.")
+            return
         
-        output = f"{BRONZE_PATH}/raw_tugas_kesibukan.csv"
-        df.to_csv(output, index=False)
+        # Isi CSV dari store (bukan hanya baris yang berubah), jadi aman juga saat 'unchanged'
+        df = pd.DataFrame(sync.records(), columns=sync.header)
+        output = save_snapshot("raw_tugas_kesibukan.csv", lambda path: df.to_csv(path, index=False))
+        sync.commit()  # Store disimpan setelah CSV bronze tertulis
         print(f"   ✅ Tersimpan: {output} ({len(df)} tugas)")
     except Exception as e:
         print(f"   ❌ Error Sheets: {e}")
@@ -96,9 +110,7 @@ def ingest_calendar():
         if not events:
             print("   ⚠️ Masih 0 Events. Pastikan akun Calendar Anda ada isinya di tanggal ini.")
         
-        output = f"{BRONZE_PATH}/raw_calendar_events.json"
-        with open(output, 'w') as f:
-            json.dump(events, f, indent=4)
+        output = save_snapshot("raw_calendar_events.json", lambda path: write_json(path, events))
         print(f"   ✅ Tersimpan: {output} ({len(events)} events ditemukan)")
         
     except Exception as e:
@@ -108,24 +120,30 @@ def ingest_calendar():
 def ingest_tmdb():
     print("\n[4/4] Ingest: TMDB API -> JSON Bronze...")
     all_movies = []
+    # Cache respons di disk: halaman yang masih dalam TTL tidak diunduh ulang.
+    # HTTP_CACHE_MODE=replay -> jalan offline dari fixtures/http (tanpa API key).
+    http = HttpCache()
     
     try:
         # Loop ambil 5 halaman (20 film x 5 = 100 film)
         for page in range(1, 51):
-            url = f"https://api.themoviedb.org/3/movie/popular?api_key={TMDB_API_KEY}&language=en-US&page={page}"
-            resp = requests.get(url)
+            url = "https://api.themoviedb.org/3/movie/popular"
+            params = {'api_key': TMDB_API_KEY, 'language': 'en-US', 'page': page}
+            resp = http.get(url, params=params)
             
             if resp.status_code == 200:
                 results = resp.json().get('results', [])
                 all_movies.extend(results)
-                print(f"   ...Halaman {page} sukses ({len(results)} film)")
+                source = "cache" if resp.from_cache else "network"
+                print(f"   ...Halaman {page} sukses ({len(results)} film, {source})")
             else:
                 print(f"   ❌ Gagal Halaman {page}: {resp.status_code}")
+
+        print(f"   📦 HTTP: {http.summary()}")
+        http.evict()  # Rapikan cache sekali per run (dulu setelah tiap halaman)
         
         # Simpan Total
-        output = f"{BRONZE_PATH}/raw_tmdb_movies.json"
-        with open(output, 'w') as f:
-            json.dump(all_movies, f, indent=4)
+        output = save_snapshot("raw_tmdb_movies.json", lambda path: write_json(path, all_movies))
         print(f"   ✅ Tersimpan: {output} (Total {len(all_movies)} film)")
         
     except Exception as e:
@@ -137,4 +155,8 @@ if __name__ == "__main__":
     ingest_sheets_tugas()
     ingest_calendar()
     ingest_tmdb()
+
+    # Bersihkan snapshot bronze yang melewati masa retensi
+    removed = prune_snapshots()
+    print(f"\n🧹 Retensi snapshot: {removed} partisi > {RETENTION_DAYS} hari dihapus.")
     print("--- FINISHED ---")
\ No newline at end of file
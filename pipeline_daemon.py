@@ -0,0 +1,243 @@
+import os
+import sys
+import time
+import argparse
+import threading
+from datetime import datetime
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+import transformation
+import gold_transformation
+import versioning
+from check_bronze import audit_file
+
+# --- KONFIGURASI ---
+BRONZE_PATH = transformation.BRONZE_PATH
+DEBOUNCE_SECONDS = float(os.getenv('DAEMON_DEBOUNCE_SECONDS', '3'))
+
+# File bronze -> langkah silver & gold yang bergantung padanya (hanya itu yang dijalankan ulang)
+SOURCE_STEPS = {
+    'raw_history_film.csv': [
+        transformation.transform_history,
+        gold_transformation.create_fact_genre,
+        gold_transformation.create_bridge_history_tmdb,
+    ],
+    'raw_tugas_kesibukan.csv': [
+        transformation.transform_tugas,
+        gold_transformation.create_fact_productivity,
+        gold_transformation.create_fact_productivity_rolling,
+        gold_transformation.create_fact_productivity_rollup,
+    ],
+    'raw_calendar_events.json': [
+        transformation.transform_calendar,
+        gold_transformation.create_fact_productivity,
+        gold_transformation.create_fact_productivity_rolling,
+        gold_transformation.create_fact_productivity_rollup,
+        gold_transformation.create_fact_busy_time,
+    ],
+    'raw_tmdb_movies.json': [
+        transformation.transform_tmdb,
+        gold_transformation.create_bridge_history_tmdb,
+    ],
+}
+
+# Urutan global agar gabungan beberapa sumber tetap berjalan sesuai dependensi
+STEP_ORDER = [
+    transformation.transform_history,
+    transformation.transform_tugas,
+    transformation.transform_calendar,
+    transformation.transform_tmdb,
+    gold_transformation.create_fact_productivity,
+    gold_transformation.create_fact_genre,
+    gold_transformation.create_fact_productivity_rolling,
+    gold_transformation.create_fact_busy_time,
+    gold_transformation.create_bridge_history_tmdb,
+    gold_transformation.create_fact_productivity_rollup,
+]
+
+# Hook polling per sumber: (nama fungsi di ingestion.py, env interval detik; 0 = mati)
+POLLERS = {
+    'tmdb': ('ingest_tmdb', 'POLL_TMDB_SECONDS'),
+    'calendar': ('ingest_calendar', 'POLL_CALENDAR_SECONDS'),
+    'sheets_tugas': ('ingest_sheets_tugas', 'POLL_SHEETS_SECONDS'),
+    'mongodb': ('ingest_mongodb', 'POLL_MONGODB_SECONDS'),
+}
+
+
+def log(message):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+
+# --- 1. MICRO-BATCH RUNNER (Debounce + single-flight) ---
+class MicroBatchRunner:
+    def __init__(self, debounce_seconds=DEBOUNCE_SECONDS):
+        self.debounce_seconds = debounce_seconds
+        self.timers = {}
+        self.pending = set()
+        self.state_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.worker = threading.Thread(target=self._run_forever, daemon=True)
+
+    def start(self):
+        self.worker.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+        with self.state_lock:
+            for timer in self.timers.values():
+                timer.cancel()
+
+    def notify(self, filename):
+        """Dipanggil tiap event file. Burst event untuk file yang sama digabung (debounce)."""
+        with self.state_lock:
+            if filename in self.timers:
+                self.timers[filename].cancel()
+            timer = threading.Timer(self.debounce_seconds, self._enqueue, args=(filename,))
+            timer.daemon = True
+            self.timers[filename] = timer
+            timer.start()
+
+    def _enqueue(self, filename):
+        with self.state_lock:
+            self.timers.pop(filename, None)
+            self.pending.add(filename)
+        self.wakeup.set()
+
+    def _run_forever(self):
+        # Satu worker = satu batch berjalan pada satu waktu; event saat batch berjalan
+        # dikumpulkan di self.pending dan diproses di batch berikutnya.
+        while not self.stopped.is_set():
+            self.wakeup.wait()
+            self.wakeup.clear()
+            with self.state_lock:
+                sources, self.pending = self.pending, set()
+            if sources:
+                self.run_batch(sources)
+
+    def run_batch(self, sources):
+        """Audit -> step silver & gold -> publish, semuanya di dalam satu pipeline_lock. Return True kalau publish."""
+        # Gate: jangan proses file yang rusak / skemanya berubah
+        valid = []
+        for filename in sorted(sources):
+            result = audit_file(filename, BRONZE_PATH)
+            if result['status'] == 'ok':
+                valid.append(filename)
+            else:
+                log(f"❌ {filename} tidak lolos audit ({result['status']}): {result['errors']}")
+        if not valid:
+            return False
+
+        wanted = {step for filename in valid for step in SOURCE_STEPS[filename]}
+        steps = [step for step in STEP_ORDER if step in wanted]
+
+        started = time.perf_counter()
+        log(f"▶️ Micro-batch {valid}: {[step.__name__ for step in steps]}")
+        try:
+            with versioning.pipeline_lock():
+                # Semua step tetap dijalankan; publish hanya kalau tidak ada yang gagal
+                failed = [step.__name__ for step in steps if not step()]
+                if failed:
+                    log(f"❌ Micro-batch gagal di {failed}, versi lama tetap dipakai dashboard")
+                    return False
+                versioning.publish()
+                versioning.gc_versions()
+        except Exception as e:
+            log(f"❌ Micro-batch gagal: {e}")
+            return False
+        log(f"✅ Micro-batch selesai dalam {time.perf_counter() - started:.1f} detik")
+        return len(valid) == len(sources)
+
+
+# --- 2. WATCHER BRONZE (watchdog) ---
+class BronzeEventHandler(FileSystemEventHandler):
+    def __init__(self, runner):
+        self.runner = runner
+
+    def _handle(self, path):
+        # Hanya file "latest" di root bronze_layer; snapshot, .tmp & laporan audit diabaikan
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(BRONZE_PATH):
+            return
+        filename = os.path.basename(path)
+        if filename in SOURCE_STEPS:
+            self.runner.notify(filename)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._handle(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._handle(event.src_path)
+
+    def on_moved(self, event):
+        # save_snapshot() menulis .tmp lalu os.replace -> muncul sebagai event "moved"
+        if not event.is_directory:
+            self._handle(event.dest_path)
+
+
+# --- 3. POLLING HOOK PER SUMBER ---
+def start_pollers(stopped):
+    threads = []
+    for source, (function_name, env_name) in POLLERS.items():
+        interval = float(os.getenv(env_name, '0'))
+        if interval <= 0:
+            continue
+
+        def poll(function_name=function_name, interval=interval, source=source):
+            import ingestion  # Import lambat: butuh kredensial Google/TMDB
+            ingest = getattr(ingestion, function_name)
+            while not stopped.wait(interval):
+                log(f"🔁 Polling sumber {source}...")
+                ingest()  # Menulis bronze -> watcher yang memicu silver & gold
+
+        thread = threading.Thread(target=poll, daemon=True, name=f"poll-{source}")
+        thread.start()
+        threads.append(thread)
+        log(f"   Polling {source} tiap {interval:.0f} detik")
+    return threads
+
+
+def run_daemon(poll=True):
+    os.makedirs(BRONZE_PATH, exist_ok=True)
+    runner = MicroBatchRunner()
+    runner.start()
+
+    observer = Observer()
+    observer.schedule(BronzeEventHandler(runner), BRONZE_PATH, recursive=False)
+    observer.start()
+    log(f"👀 Memantau {BRONZE_PATH}/ (debounce {DEBOUNCE_SECONDS} detik)")
+
+    if poll:
+        start_pollers(runner.stopped)
+
+    try:
+        while observer.is_alive():
+            observer.join(1)
+    except KeyboardInterrupt:
+        log("Berhenti...")
+    finally:
+        runner.stop()
+        observer.stop()
+        observer.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daemon micro-batch: bronze berubah -> silver & gold sumber itu saja.")
+    parser.add_argument('--no-poll', action='store_true', help="Matikan polling ingestion, hanya pantau file")
+    parser.add_argument('--once', action='store_true',
+                        help="Jalankan semua step + publish sekali (satu lock, dipakai run_pipeline.sh) lalu keluar")
+    args = parser.parse_args()
+
+    if args.once:
+        # Satu lock untuk silver, gold & publish: micro-batch daemon tidak bisa menyela di antara step
+        print("--- 🔄 START FULL PIPELINE RUN (SILVER -> GOLD -> PUBLISH) 🔄 ---")
+        ok = MicroBatchRunner().run_batch(set(SOURCE_STEPS))
+        sys.exit(0 if ok else 1)
+
+    print("--- ⚡ START EVENT-DRIVEN PIPELINE DAEMON ⚡ ---")
+    run_daemon(poll=not args.no_poll)
+    sys.exit(0)
@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from datetime import datetime, timezone
+from versioning import atomic_write
+
+# --- KONFIGURASI PATH ---
+QUARANTINE_PATH = 'quarantine_layer'  # Baris yang gagal rule + kode alasannya
+QUALITY_METRICS_FILE = os.path.join('cache', 'quality_metrics.json')
+
+# severity:
+#   quarantine : baris gagal dikeluarkan dari silver & ditulis ke quarantine_layer
+#   warn       : baris tetap masuk silver, hanya dihitung di metrik
+# Rule freshness berlaku per tabel (tidak pernah mengkarantina baris).
+RULES = {
+    'dim_history_film': [
+        {'code': 'HIST_TITLE_NULL', 'type': 'not_null', 'column': 'title'},
+        {'code': 'HIST_TITLE_DUPLICATE', 'type': 'unique', 'column': 'title'},
+        {'code': 'HIST_TITLE_BLANK', 'type': 'regex', 'column': 'title', 'pattern': r'\S'},
+    ],
+    'dim_tasks': [
+        {'code': 'TASK_NAME_NULL', 'type': 'not_null', 'column': 'task_name'},
+        {'code': 'TASK_DEADLINE_INVALID', 'type': 'not_null', 'column': 'deadline_clean'},
+        {'code': 'TASK_HOURS_NOT_POSITIVE', 'type': 'range', 'column': 'estimation_hours', 'min': 0, 'min_inclusive': False},
+        {'code': 'TASK_PROGRESS_RANGE', 'type': 'range', 'column': 'progress_clean', 'min': 0, 'max': 1, 'severity': 'warn'},
+        {'code': 'TASK_CATEGORY_UNKNOWN', 'type': 'referential', 'column': 'category',
+         'values': ['Akademik', 'Non-Akademik'], 'severity': 'warn'},
+        {'code': 'TASK_LOAD_TYPE_UNKNOWN', 'type': 'referential', 'column': 'load_type',
+         'values': ['Sesi', 'Dicicil'], 'severity': 'warn'},
+        {'code': 'TASK_STALE', 'type': 'freshness', 'column': 'deadline_clean', 'max_age_days': 180},
+    ],
+    'dim_calendar': [
+        {'code': 'CAL_START_NULL', 'type': 'not_null', 'column': 'start_time'},
+        {'code': 'CAL_END_NULL', 'type': 'not_null', 'column': 'end_time'},
+        {'code': 'CAL_END_BEFORE_START', 'type': 'range', 'column': 'end_time', 'min_column': 'start_time'},
+        {'code': 'CAL_STALE', 'type': 'freshness', 'column': 'start_time', 'max_age_days': 30},
+    ],
+    'dim_tmdb_movies': [
+        {'code': 'TMDB_ID_NULL', 'type': 'not_null', 'column': 'id'},
+        {'code': 'TMDB_ID_DUPLICATE', 'type': 'unique', 'column': 'id'},
+        {'code': 'TMDB_TITLE_NULL', 'type': 'not_null', 'column': 'title'},
+        {'code': 'TMDB_VOTE_RANGE', 'type': 'range', 'column': 'vote_average', 'min': 0, 'max': 10},
+        {'code': 'TMDB_POPULARITY_NEGATIVE', 'type': 'range', 'column': 'popularity', 'min': 0},
+        {'code': 'TMDB_RELEASE_DATE_FORMAT', 'type': 'regex', 'column': 'release_date',
+         'pattern': r'^\d{4}-\d{2}-\d{2}$', 'severity': 'warn'},
+        {'code': 'TMDB_OVERVIEW_NULL', 'type': 'not_null', 'column': 'overview', 'severity': 'warn'},
+    ],
+}
+
+
+class QualityRuleError(ValueError):
+    """Definisi rule tidak valid (kolom / tipe rule tidak dikenal) -> konfigurasi, bukan data."""
+
+
+# --- 1. EVALUASI RULE (Satu mask boolean per rule, tanpa loop per baris) ---
+def _values(df, column):
+    if column not in df.columns:
+        raise QualityRuleError(f"Kolom '{column}' tidak ada untuk rule kualitas")
+    return df[column]
+
+
+def _to_timestamp(value):
+    ts = pd.Timestamp(value)
+    return ts if ts.tzinfo is None else ts.tz_convert('UTC')
+
+
+def rule_mask(df, rule, silver_path=None):
+    """Return array bool: True = baris GAGAL rule. Null dianggap lolos kecuali rule not_null."""
+    kind = rule['type']
+    values = _values(df, rule['column'])
+
+    if kind == 'not_null':
+        return values.isna().to_numpy()
+
+    if kind == 'unique':
+        # Kemunculan pertama lolos, duplikat sesudahnya gagal (sama seperti drop_duplicates)
+        return (values.duplicated(keep='first') & values.notna()).to_numpy()
+
+    if kind == 'range':
+        failed = np.zeros(len(df), dtype=bool)
+        if not pd.api.types.is_datetime64_any_dtype(values):
+            values = pd.to_numeric(values, errors='coerce')  # Kolom kosong (object None) -> NaN
+        lower = _values(df, rule['min_column']) if 'min_column' in rule else rule.get('min')
+        upper = _values(df, rule['max_column']) if 'max_column' in rule else rule.get('max')
+        if lower is not None:
+            too_low = values <= lower if rule.get('min_inclusive', True) is False else values < lower
+            failed |= too_low.fillna(False).to_numpy(dtype=bool)
+        if upper is not None:
+            too_high = values >= upper if rule.get('max_inclusive', True) is False else values > upper
+            failed |= too_high.fillna(False).to_numpy(dtype=bool)
+        return failed
+
+    if kind == 'regex':
+        # Regex di pyarrow (C++, vectorized) jauh lebih cepat dari .str.match untuk jutaan baris
+        array = pa.array(values.astype('string'), from_pandas=True, type=pa.string())
+        matched = pc.match_substring_regex(array, rule['pattern'])
+        return pc.invert(pc.fill_null(matched, True)).to_numpy(zero_copy_only=False)
+
+    if kind == 'referential':
+        # Referensi statis ('values') atau kolom tabel silver lain ('ref': 'dim_x.kolom')
+        if 'ref' in rule:
+            ref_table, ref_column = rule['ref'].split('.')
+            reference = pd.read_parquet(f"{silver_path}/{ref_table}.parquet", columns=[ref_column])[ref_column]
+        else:
+            reference = pd.Series(rule['values'])
+        return (~values.isin(reference.dropna().unique()) & values.notna()).to_numpy()
+
+    raise QualityRuleError(f"Tipe rule '{kind}' tidak dikenal ({rule['code']})")
+
+
+def check_freshness(df, rule, now=None):
+    """Rule tingkat tabel: nilai terbaru kolom harus lebih muda dari max_age_days."""
+    values = _values(df, rule['column']).dropna()
+    now = _to_timestamp(now or datetime.now(timezone.utc))
+    if values.empty:
+        return {'passed': False, 'latest': None}
+    latest = _to_timestamp(values.max())
+    if latest.tzinfo is None:
+        now = now.tz_localize(None) if now.tzinfo is not None else now
+    age_days = (now - latest) / pd.Timedelta(days=1)
+    return {'passed': bool(age_days <= rule['max_age_days']), 'latest': str(latest), 'age_days': round(age_days, 1)}
+
+
+# --- 2. VALIDASI SATU TABEL ---
+def validate(df, table_name, silver_path=None, now=None):
+    """
+    Jalankan semua rule tabel sekali jalan.
+    Return (df_lolos, df_karantina, metrik). df_karantina punya kolom reason_codes.
+    """
+    started = time.perf_counter()
+    rules = RULES.get(table_name, [])
+    row_rules = [rule for rule in rules if rule['type'] != 'freshness']
+    if not df.index.equals(pd.RangeIndex(len(df))):
+        df = df.reset_index(drop=True)  # Salin hanya kalau index belum 0..n-1
+
+    # Matriks (rule x baris): satu pass, lalu dipakai untuk mask karantina & hitungan per rule
+    masks = np.vstack([rule_mask(df, rule, silver_path) for rule in row_rules]) if row_rules else np.zeros((0, len(df)), dtype=bool)
+    blocking = np.array([rule.get('severity', 'quarantine') == 'quarantine' for rule in row_rules], dtype=bool)
+    quarantined = masks[blocking].any(axis=0) if blocking.any() else np.zeros(len(df), dtype=bool)
+    failed_counts = masks.sum(axis=1)
+
+    df_quarantine = df[quarantined].copy()
+    if len(df_quarantine):
+        codes = np.array([rule['code'] for rule in row_rules])
+        blocking_masks = masks[:, quarantined] & blocking[:, None]
+        df_quarantine['reason_codes'] = [','.join(codes[column]) for column in blocking_masks.T]
+
+    metrics = {
+        'table': table_name,
+        'checked_at': datetime.now(timezone.utc).isoformat(),
+        'rows_in': int(len(df)),
+        'rows_passed': int(len(df) - quarantined.sum()),
+        'rows_quarantined': int(quarantined.sum()),
+        'rules': {
+            rule['code']: {'type': rule['type'], 'severity': rule.get('severity', 'quarantine'), 'failed': int(count)}
+            for rule, count in zip(row_rules, failed_counts)
+        },
+    }
+    for rule in rules:
+        if rule['type'] == 'freshness':
+            result = check_freshness(df, rule, now)
+            metrics['rules'][rule['code']] = {'type': 'freshness', 'severity': 'warn', 'failed': int(not result['passed']), **result}
+    metrics['seconds'] = round(time.perf_counter() - started, 4)
+
+    df_passed = df[~quarantined].reset_index(drop=True) if quarantined.any() else df
+    return df_passed, df_quarantine, metrics
+
+
+# --- 3. KARANTINA & METRIK ---
+def write_quarantine(df_quarantine, table_name, quarantine_path=QUARANTINE_PATH):
+    """Semua kolom disimpan sebagai string: baris karantina justru yang tipenya sering rusak."""
+    path = f"{quarantine_path}/{table_name}.parquet"
+    if df_quarantine.empty:
+        if os.path.exists(path):
+            os.remove(path)  # Tidak ada lagi baris bermasalah -> karantina lama tidak berlaku
+        return None
+
+    df_out = df_quarantine.astype('string').assign(quarantined_at=datetime.now(timezone.utc).isoformat())
+    table = pa.Table.from_pandas(df_out, preserve_index=False)
+    return atomic_write(path, lambda tmp_path: pq.write_table(table, tmp_path, compression='zstd'))
+
+
+def record_metrics(metrics, metrics_file=QUALITY_METRICS_FILE):
+    """Simpan metrik terbaru per tabel (dibaca dashboard / monitoring)."""
+    try:
+        with open(metrics_file, 'r') as f:
+            all_metrics = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        all_metrics = {}
+    all_metrics[metrics['table']] = metrics
+    atomic_write(metrics_file, lambda tmp_path: _dump_json(tmp_path, all_metrics))
+
+
+def _dump_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+def apply_quality_rules(df, table_name, silver_path='silver_layer', metrics_file=None):
+    """Validasi + tulis karantina + catat metrik. Return DataFrame yang lolos."""
+    df_passed, df_quarantine, metrics = validate(df, table_name, silver_path)
+    # Karantina & metrik di sebelah folder silver. Pipeline utama -> quarantine_layer & cache/,
+    # backfill -> backfill_work/dt=.../ (worker paralel tidak berebut satu file metrik)
+    base_path = os.path.dirname(os.path.normpath(silver_path))
+    if metrics_file is None:
+        metrics_file = os.path.join(base_path, 'quality_metrics.json') if base_path else QUALITY_METRICS_FILE
+    write_quarantine(df_quarantine, table_name, os.path.join(base_path, QUARANTINE_PATH))
+    record_metrics(metrics, metrics_file)
+
+    print(f"   🧪 Kualitas {table_name}: {metrics['rows_passed']}/{metrics['rows_in']} lolos, "
+          f"{metrics['rows_quarantined']} dikarantina ({metrics['seconds'] * 1000:.0f} ms)")
+    for code, result in metrics['rules'].items():
+        if result['failed']:
+            print(f"      ⚠️ {code} ({result['severity']}): {result['failed']}")
+    return df_passed
@@ -0,0 +1,377 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+import versioning
+
+# --- KONFIGURASI ---
+QUERY_HOST = os.getenv('QUERY_HOST', '127.0.0.1')
+QUERY_PORT = int(os.getenv('QUERY_PORT', '8765'))
+QUERY_CACHE_ENTRIES = int(os.getenv('QUERY_CACHE_ENTRIES', '256'))
+MAX_RESULT_ROWS = int(os.getenv('QUERY_MAX_ROWS', '100000'))
+ARROW_STREAM_TYPE = 'application/vnd.apache.arrow.stream'
+
+FILTER_OPS = {
+    '==': lambda f, v: f == v,
+    '!=': lambda f, v: f != v,
+    '<': lambda f, v: f < v,
+    '<=': lambda f, v: f <= v,
+    '>': lambda f, v: f > v,
+    '>=': lambda f, v: f >= v,
+    'in': lambda f, v: f.isin(v),
+    'not in': lambda f, v: ~f.isin(v),
+}
+AGGREGATES = {'sum', 'mean', 'min', 'max', 'count', 'count_distinct'}
+SORT_ORDERS = {'ascending', 'descending'}
+
+
+class QueryError(ValueError):
+    """Query tidak valid (tabel/kolom/operator tidak dikenal) -> HTTP 400."""
+
+
+# --- 1. RESOLUSI TABEL (Selalu dari versi terpublikasi, sama seperti dashboard) ---
+def list_tables(version=None):
+    tables = {}
+    for layer in versioning.LAYERS:
+        folder = versioning.resolve_path(layer, version)
+        if os.path.isdir(folder):
+            for filename in sorted(os.listdir(folder)):
+                if filename.endswith('.parquet'):
+                    tables[filename[:-len('.parquet')]] = f"{layer}/{filename}"
+    return tables
+
+
+def table_path(table, version=None):
+    """'fact_genre_stats' atau 'gold_layer/fact_genre_stats' -> path parquet di versi tsb."""
+    tables = list_tables(version)
+    relpath = tables.get(table)
+    if relpath is None and f"{table}.parquet" in tables.values():
+        relpath = f"{table}.parquet"
+    if relpath is None:
+        raise QueryError(f"Tabel '{table}' tidak ditemukan")
+    return versioning.resolve_path(relpath, version)
+
+
+# --- 2. EKSEKUSI QUERY (Projection, filter & group-by di-push ke pyarrow.dataset) ---
+def filter_value(value, field_type):
+    """Nilai JSON -> scalar Arrow bertipe kolom ('2025-01-01' -> date32, dst.)."""
+    if pa.types.is_dictionary(field_type):
+        field_type = field_type.value_type
+    if isinstance(value, list):
+        return pa.array(value).cast(field_type)
+    return pa.scalar(value).cast(field_type)
+
+
+def build_filter(filters, schema):
+    expression = None
+    for column, op, value in filters:
+        if column not in schema.names:
+            raise QueryError(f"Kolom filter '{column}' tidak ada")
+        if op not in FILTER_OPS:
+            raise QueryError(f"Operator '{op}' tidak didukung ({', '.join(FILTER_OPS)})")
+        try:
+            condition = FILTER_OPS[op](ds.field(column), filter_value(value, schema.field(column).type))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+            raise QueryError(f"Nilai filter '{column}' tidak valid: {e}")
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _names(query, key):
+    value = query.get(key) or []
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise QueryError(f"'{key}' harus list nama kolom")
+    return list(value)
+
+
+def _items(query, key, size, example):
+    value = query.get(key) or []
+    if not isinstance(value, list) or not all(isinstance(item, list) and len(item) == size for item in value):
+        raise QueryError(f"'{key}' harus list berisi {size} elemen per item, contoh {example}")
+    return [list(item) for item in value]
+
+
+def normalize_query(query):
+    """
+    Bentuk kanonik (urutan kunci & default tetap) -> dipakai juga sebagai kunci cache.
+    Bentuk query yang salah ditolak di sini sebagai QueryError (400), bukan error 500 saat eksekusi.
+    """
+    if not isinstance(query, dict) or not isinstance(query.get('table'), str) or not query['table']:
+        raise QueryError("Query wajib berisi 'table'")
+
+    limit = query.get('limit')
+    if limit is None:
+        limit = MAX_RESULT_ROWS
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit < 0:
+        raise QueryError("'limit' harus bilangan bulat >= 0")
+
+    order_by = _items(query, 'order_by', 2, "[['total_hours', 'descending']]")
+    for column, order in order_by:
+        if order not in SORT_ORDERS:
+            raise QueryError(f"Urutan '{order}' tidak didukung ({', '.join(sorted(SORT_ORDERS))})")
+
+    return {
+        'table': query['table'],
+        'columns': _names(query, 'columns'),
+        'filter': _items(query, 'filter', 3, "[['category', '==', 'Akademik']]"),
+        'group_by': _names(query, 'group_by'),
+        'aggregates': _items(query, 'aggregates', 2, "[['total_hours', 'sum']]"),
+        'order_by': order_by,
+        'limit': min(limit, MAX_RESULT_ROWS),
+    }
+
+
+def execute_query(query, version=None):
+    """
+    query = {
+        'table': 'fact_daily_productivity',
+        'columns': ['date', 'category', 'total_hours'],              # projection
+        'filter': [['date', '>=', '2025-09-01'], ['category', 'in', ['Akademik']]],
+        'group_by': ['category'],
+        'aggregates': [['total_hours', 'sum'], ['date', 'count']],
+        'order_by': [['total_hours_sum', 'descending']],
+        'limit': 100,
+    }
+    Hanya kolom yang dibutuhkan yang dibaca, dan filter memakai statistik row group
+    parquet, jadi row group yang tidak relevan tidak didekode sama sekali.
+    """
+    query = normalize_query(query)
+    if version is not None and not (isinstance(version, str) and versioning.version_exists(version)):
+        # resolve_path akan diam-diam fallback ke folder kerja -> tolak saja
+        raise QueryError(f"Versi '{version}' tidak ditemukan")
+    dataset = ds.dataset(table_path(query['table'], version), format='parquet')
+    schema = dataset.schema
+
+    for column, function in query['aggregates']:
+        if function not in AGGREGATES:
+            raise QueryError(f"Agregasi '{function}' tidak didukung ({', '.join(sorted(AGGREGATES))})")
+    needed = query['columns'] + query['group_by'] + [column for column, _ in query['aggregates']]
+    needed = list(dict.fromkeys(needed)) or schema.names
+    unknown = [column for column in needed if column not in schema.names]
+    if unknown:
+        raise QueryError(f"Kolom tidak ada: {unknown}")
+
+    table = dataset.to_table(columns=needed, filter=build_filter(query['filter'], schema))
+
+    if query['group_by'] or query['aggregates']:
+        aggregates = [(column, function) for column, function in query['aggregates']]
+        table = table.group_by(query['group_by']).aggregate(aggregates)
+    elif query['columns']:
+        table = table.select(query['columns'])
+
+    if query['order_by']:
+        # Kolom urut dicek terhadap skema hasil (setelah agregasi, mis. 'total_hours_sum')
+        unknown = [column for column, _ in query['order_by'] if column not in table.schema.names]
+        if unknown:
+            raise QueryError(f"Kolom order_by tidak ada di hasil: {unknown} (tersedia: {table.schema.names})")
+        table = table.sort_by([(column, order) for column, order in query['order_by']])
+    return table.slice(0, query['limit'])
+
+
+# --- 3. CACHE LRU (Kunci = versi lakehouse + query kanonik) ---
+class QueryCache:
+    def __init__(self, max_entries=QUERY_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.version = None
+        self.stats = {'hit': 0, 'miss': 0, 'invalidated': 0}
+
+    def get_or_run(self, query, version=None):
+        """Return (table, versi, hit). Tanpa versi eksplisit selalu ikut CURRENT terbaru."""
+        version = version or versioning.current_version()
+        if version is None:
+            # Belum pernah publish -> file kerja bisa berubah kapan saja, jangan di-cache
+            return execute_query(query), None, False
+
+        with self.lock:
+            # Publish baru -> semua hasil versi lama dibuang (versi lama tetap bisa diminta eksplisit)
+            if version != self.version and version == versioning.current_version():
+                if self.entries:
+                    self.stats['invalidated'] += 1
+                self.entries.clear()
+                self.version = version
+
+        key = (version, json.dumps(normalize_query(query), sort_keys=True, default=str))
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats['hit'] += 1
+                return self.entries[key], version, True
+
+        # Eksekusi di luar lock: query berbeda boleh jalan paralel (pyarrow melepas GIL)
+        table = execute_query(query, version)
+        with self.lock:
+            self.stats['miss'] += 1
+            self.entries[key] = table
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return table, version, False
+
+
+# --- 4. SERIALISASI HASIL ---
+def to_arrow_ipc(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def to_json(table):
+    return json.dumps({'columns': table.schema.names, 'rows': table.to_pylist()}, default=str).encode('utf-8')
+
+
+# --- 5. HTTP SERVER ---
+class QueryHandler(BaseHTTPRequestHandler):
+    cache = None  # Diisi make_server()
+
+    def log_message(self, format, *args):
+        pass  # Tanpa log per request (benchmark bisa ribuan request)
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({'error': message}).encode('utf-8'))
+
+    def do_GET(self):
+        if self.path.rstrip('/') in ('', '/tables'):
+            body = {'version': versioning.current_version(), 'tables': list_tables()}
+            self._send(200, json.dumps(body).encode('utf-8'))
+        else:
+            self._error(404, "Endpoint: GET /tables, POST /query")
+
+    def do_POST(self):
+        if not self.path.startswith('/query'):
+            self._error(404, "Endpoint: GET /tables, POST /query")
+            return
+        try:
+            length = int(self.headers.get('Content-Length', '0'))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise QueryError("Body harus objek JSON")
+            table, version, hit = self.cache.get_or_run(request.get('query', request), request.get('version'))
+        except (QueryError, json.JSONDecodeError) as e:
+            self._error(400, str(e))
+            return
+        except Exception as e:
+            self._error(500, f"Query gagal: {e}")
+            return
+
+        headers = {'X-Lakehouse-Version': str(version), 'X-Cache': 'hit' if hit else 'miss'}
+        wants_arrow = 'format=arrow' in self.path or ARROW_STREAM_TYPE in self.headers.get('Accept', '')
+        if wants_arrow:
+            self._send(200, to_arrow_ipc(table), ARROW_STREAM_TYPE, headers)
+        else:
+            self._send(200, to_json(table), 'application/json', headers)
+
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Default socketserver (5) membuat klien paralel kena retry SYN 1 detik
+
+
+def make_server(host=QUERY_HOST, port=QUERY_PORT, cache=None):
+    handler = type('BoundQueryHandler', (QueryHandler,), {'cache': cache or QueryCache()})
+    return QueryServer((host, port), handler)
+
+
+# --- 6. BENCHMARK KONKURENSI ---
+BENCH_QUERIES = [
+    {'table': 'fact_daily_productivity', 'group_by': ['category'], 'aggregates': [['total_hours', 'sum'], ['date', 'count']]},
+    {'table': 'fact_daily_productivity', 'columns': ['date', 'total_hours'], 'filter': [['category', '==', 'Akademik']]},
+    {'table': 'fact_productivity_rolling', 'columns': ['date', 'category', 'rolling_7d'], 'filter': [['category', '==', 'All']]},
+    {'table': 'fact_genre_stats', 'order_by': [['total_watched', 'descending']], 'limit': 5},
+    {'table': 'dim_tmdb_movies', 'columns': ['title', 'vote_average'], 'filter': [['vote_average', '>=', 7.5]]},
+]
+
+
+def run_benchmark(threads=8, requests_count=400, fmt='arrow'):
+    tables = list_tables()
+    queries = [q for q in BENCH_QUERIES if q['table'] in tables]
+    if not queries:
+        print("   ⚠️ Belum ada tabel silver/gold untuk di-benchmark. Jalankan pipeline dulu.")
+        return
+
+    # Tanpa cache (setiap request membaca parquet) vs dengan cache LRU
+    for label, cache_entries in [('tanpa cache', 0), ('dengan cache', QUERY_CACHE_ENTRIES)]:
+        print(f"\n[{label}]")
+        bench_server(queries, QueryCache(cache_entries), threads, requests_count, fmt)
+
+
+def bench_server(queries, cache, threads, requests_count, fmt):
+    server = make_server(port=0, cache=cache)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{server.server_address[0]}:{server.server_address[1]}/query?format={fmt}"
+
+    def call(i):
+        body = json.dumps({'query': queries[i % len(queries)]}).encode('utf-8')
+        started = time.perf_counter()
+        with urllib.request.urlopen(urllib.request.Request(url, data=body, method='POST')) as resp:
+            payload = resp.read()
+        return time.perf_counter() - started, len(payload)
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(call, range(requests_count)))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    stats = cache.stats
+    print(f"   {requests_count} request, {threads} thread, format {fmt}: {requests_count / elapsed:.0f} req/detik")
+    print(f"   Latensi p50 {statistics.median(latencies):.1f} ms | p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms "
+          f"| max {latencies[-1]:.1f} ms")
+    print(f"   Cache: hit {stats['hit']}, miss {stats['miss']} | rata-rata payload {sum(n for _, n in results) / len(results):.0f} byte")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query service lokal di atas silver_layer & gold_layer (versi terpublikasi).")
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('serve', help="Jalankan HTTP server")
+    serve.add_argument('--host', default=QUERY_HOST)
+    serve.add_argument('--port', type=int, default=QUERY_PORT)
+    query = sub.add_parser('query', help="Jalankan satu query JSON dan cetak hasilnya")
+    query.add_argument('json')
+    bench = sub.add_parser('bench', help="Benchmark request paralel ke server lokal")
+    bench.add_argument('--threads', type=int, default=8)
+    bench.add_argument('--requests', type=int, default=400)
+    bench.add_argument('--format', choices=['arrow', 'json'], default='arrow')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        server = make_server(args.host, args.port)
+        print(f"--- 🔎 QUERY SERVICE di http://{args.host}:{args.port} (versi {versioning.current_version()}) ---")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+    elif args.command == 'query':
+        try:
+            print(execute_query(json.loads(args.json)).to_pandas().to_string())
+        except QueryError as e:
+            print(f"   ❌ Query tidak valid: {e}")
+            sys.exit(1)
+    else:
+        print("--- ⏱️ BENCHMARK QUERY SERVICE ---")
+        run_benchmark(args.threads, args.requests, args.format)
@@ -48,19 +48,20 @@ if [ $? -ne 0 ]; then
     exit 1
 fi
 
-# STEP 3: Silver Transform
-log "INFO" "▶️ [Docker] Menjalankan Step 3: Silver Transformation..."
-docker exec $CONTAINER_NAME python transformation.py >> "$LOG_FILE" 2>&1
+# STEP 2b: Audit Bronze (Gate: jangan transform data yang rusak / skemanya berubah)
+log "INFO" "▶️ [Docker] Menjalankan Step 2b: Audit Bronze (metadata)..."
+docker exec $CONTAINER_NAME python check_bronze.py --audit >> "$LOG_FILE" 2>&1
 if [ $? -ne 0 ]; then
-    log "ERROR" "❌ Gagal di Step 3 (Silver). Pipeline berhenti."
+    log "ERROR" "❌ Gagal di Step 2b (Audit Bronze). Cek bronze_layer/_audit_report.json. Pipeline berhenti."
     exit 1
 fi
 
-# STEP 4: Gold Transform
-log "INFO" "▶️ [Docker] Menjalankan Step 4: Gold Transformation..."
-docker exec $CONTAINER_NAME python gold_transformation.py >> "$LOG_FILE" 2>&1
+# STEP 3-5: Silver -> Gold -> Publish dalam satu proses & satu pipeline_lock
+# (kalau dijalankan terpisah, daemon bisa menyela di antara step & mempublikasikan silver baru + gold lama)
+log "INFO" "▶️ [Docker] Menjalankan Step 3-5: Silver, Gold & Publish Versi Lakehouse..."
+docker exec $CONTAINER_NAME python pipeline_daemon.py --once >> "$LOG_FILE" 2>&1
 if [ $? -ne 0 ]; then
-    log "ERROR" "❌ Gagal di Step 4 (Gold). Pipeline berhenti."
+    log "ERROR" "❌ Gagal di Step 3-5 (Silver/Gold/Publish). Dashboard tetap memakai versi sebelumnya."
     exit 1
 fi
 
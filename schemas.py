@@ -0,0 +1,212 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from versioning import atomic_write
+
+# --- PENGATURAN WRITER PARQUET ---
+COMPRESSION = 'zstd'
+COMPRESSION_LEVEL = 3
+ROW_GROUP_SIZE = 128 * 1024  # baris per row group (statistik min/max per grup -> filter lebih cepat)
+
+# Tipe ringkas yang dipakai berulang
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+UTC_TIMESTAMP = pa.timestamp('ms', tz='UTC')
+LOCAL_TIMESTAMP = pa.timestamp('ms')
+
+
+class SchemaDriftError(ValueError):
+    """DataFrame tidak cocok dengan skema yang dideklarasikan di registry."""
+
+
+# --- REGISTRY SKEMA SILVER & GOLD ---
+# schema  : skema Arrow final file parquet
+# sort_by : urutan baris sebelum ditulis (statistik row group jadi rapat)
+TABLES = {
+    # SILVER
+    'dim_history_film': {
+        'schema': pa.schema([
+            ('title', pa.string()),
+            ('genres', CATEGORY),
+        ]),
+        'sort_by': [('title', 'ascending')],
+    },
+    'dim_tasks': {
+        'schema': pa.schema([
+            ('task_name', pa.string()),
+            ('estimation_hours', pa.float32()),
+            ('progress_clean', pa.float32()),
+            ('deadline_clean', pa.date32()),
+            ('category', CATEGORY),
+            ('load_type', CATEGORY),
+        ]),
+        'sort_by': [('deadline_clean', 'ascending')],
+    },
+    'dim_calendar': {
+        'schema': pa.schema([
+            ('event_title', pa.string()),
+            ('start_time', UTC_TIMESTAMP),
+            ('end_time', UTC_TIMESTAMP),
+            ('is_all_day', pa.bool_()),
+        ]),
+        'sort_by': [('start_time', 'ascending')],
+    },
+    'dim_tmdb_movies': {
+        'schema': pa.schema([
+            ('id', pa.int32()),
+            ('title', pa.string()),
+            ('genre_ids', pa.string()),
+            ('vote_average', pa.float32()),
+            ('popularity', pa.float32()),
+            ('release_date', pa.string()),
+            ('overview', pa.string()),
+        ]),
+        'sort_by': [('popularity', 'descending')],
+    },
+    # GOLD
+    'fact_daily_productivity': {
+        'schema': pa.schema([
+            ('date', pa.date32()),
+            ('category', CATEGORY),
+            ('total_hours', pa.float32()),
+            ('total_activities', pa.int32()),
+        ]),
+        'sort_by': [('date', 'ascending'), ('category', 'ascending')],
+    },
+    'fact_genre_stats': {
+        'schema': pa.schema([
+            ('genre_name', pa.string()),
+            ('total_watched', pa.int32()),
+        ]),
+        'sort_by': [('total_watched', 'descending')],
+    },
+    'fact_productivity_rolling': {
+        'schema': pa.schema([
+            ('date', pa.date32()),
+            ('category', CATEGORY),
+            ('total_hours', pa.float32()),
+            ('rolling_3d', pa.float32()),
+            ('rolling_7d', pa.float32()),
+            ('rolling_28d', pa.float32()),
+            ('ewma_7d', pa.float32()),
+            ('momentum', pa.float32()),
+            ('trend_status', CATEGORY),
+            ('forecast_next_day', pa.float32()),
+        ]),
+        'sort_by': [('category', 'ascending'), ('date', 'ascending')],
+    },
+    'fact_busy_time': {
+        'schema': pa.schema([
+            ('date', pa.date32()),
+            ('busy_hours', pa.float32()),
+            ('busy_blocks', pa.int32()),
+            ('scheduled_hours', pa.float32()),
+            ('overlap_hours', pa.float32()),
+            ('free_hours', pa.float32()),
+            ('longest_free_hours', pa.float32()),
+        ]),
+        'sort_by': [('date', 'ascending')],
+    },
+    'fact_free_windows': {
+        'schema': pa.schema([
+            ('date', pa.date32()),
+            ('window_start', LOCAL_TIMESTAMP),
+            ('window_end', LOCAL_TIMESTAMP),
+            ('free_hours', pa.float32()),
+        ]),
+        'sort_by': [('window_start', 'ascending')],
+    },
+    'fact_productivity_rollup': {
+        'schema': pa.schema([
+            ('grain', CATEGORY),
+            ('period_start', pa.date32()),
+            ('category', CATEGORY),
+            ('total_hours', pa.float32()),
+            ('total_activities', pa.int32()),
+            ('active_days', pa.int32()),
+        ]),
+        'sort_by': [('grain', 'ascending'), ('category', 'ascending'), ('period_start', 'ascending')],
+    },
+    'bridge_history_tmdb': {
+        'schema': pa.schema([
+            ('title', pa.string()),
+            ('title_key', pa.string()),
+            ('tmdb_id', pa.int32()),
+            ('tmdb_title', pa.string()),
+            ('match_type', CATEGORY),
+            ('match_score', pa.float32()),
+        ]),
+        'sort_by': [('title', 'ascending')],
+    },
+}
+
+
+def get_table_spec(table_name, history=False):
+    """Spesifikasi tabel. history=True -> versi backfill dengan kolom snapshot_date di depan."""
+    if table_name not in TABLES:
+        raise SchemaDriftError(f"Tabel '{table_name}' belum terdaftar di schemas.TABLES")
+    spec = TABLES[table_name]
+    if not history:
+        return spec
+    return {
+        'schema': pa.schema([('snapshot_date', pa.date32())] + list(spec['schema'])),
+        'sort_by': [('snapshot_date', 'ascending')] + spec['sort_by'],
+    }
+
+
+def to_arrow_column(series, field):
+    """Konversi satu kolom pandas ke tipe Arrow yang dideklarasikan (error = drift)."""
+    if pa.types.is_date32(field.type) and pd.api.types.is_datetime64_any_dtype(series):
+        series = series.dt.date
+
+    array = pa.array(series, from_pandas=True)
+    if pa.types.is_dictionary(array.type):
+        array = array.dictionary_decode()
+
+    try:
+        if pa.types.is_dictionary(field.type):
+            return array.cast(field.type.value_type).dictionary_encode()
+        # float64 -> float32 sengaja boleh kehilangan presisi; tipe lain dicek ketat
+        return array.cast(field.type, safe=not pa.types.is_floating(field.type))
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+        raise SchemaDriftError(f"Kolom '{field.name}' ({array.type}) tidak bisa jadi {field.type}: {e}")
+
+
+def to_arrow_table(df, table_name, history=False):
+    spec = get_table_spec(table_name, history)
+    schema = spec['schema']
+
+    # Fail fast: kolom harus persis sama dengan deklarasi
+    missing = [name for name in schema.names if name not in df.columns]
+    extra = [name for name in df.columns if name not in schema.names]
+    if missing or extra:
+        raise SchemaDriftError(f"Skema '{table_name}' berubah. Hilang: {missing}, tidak terdaftar: {extra}")
+
+    sort_by = spec.get('sort_by') or []
+    if sort_by and len(df) > 0:
+        df = df.sort_values(
+            [col for col, _ in sort_by],
+            ascending=[order == 'ascending' for _, order in sort_by],
+            kind='stable',
+        )
+
+    arrays = [to_arrow_column(df[field.name], field) for field in schema]
+    return pa.Table.from_arrays(arrays, schema=schema), sort_by
+
+
+def write_table(df, table_name, path, history=False):
+    """Satu-satunya jalur tulis parquet silver/gold: validasi skema, sort, lalu tulis atomik."""
+    table, sort_by = to_arrow_table(df, table_name, history)
+    sorting_columns = pq.SortingColumn.from_ordering(table.schema, sort_by) if sort_by else None
+
+    def write(tmp_path):
+        pq.write_table(
+            table, tmp_path,
+            compression=COMPRESSION,
+            compression_level=COMPRESSION_LEVEL,
+            row_group_size=ROW_GROUP_SIZE,
+            use_dictionary=True,
+            write_statistics=True,
+            sorting_columns=sorting_columns,
+        )
+
+    return atomic_write(path, write)
@@ -2,8 +2,10 @@ import gspread
 import pandas as pd
 import os
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from gspread.utils import numericise_all
+from pymongo import MongoClient, ReplaceOne
 from google.oauth2.service_account import Credentials
+from sheets_incremental import sync_worksheet
 
 
 # --- KONFIGURASI ---
@@ -30,8 +32,10 @@ def seed_data_from_cloud():
         # Buka Sheet
         print("   ...Menghubungi Google Drive...")
         sheet = client.open(SHEET_NAME).sheet1
-        data = sheet.get_all_records() 
-        print(f"   ✅ Berhasil menarik {len(data)} data dari Google Sheets.")
+        # Hanya baris baru / berubah yang dikirim ke Mongo (store di bronze_layer/_sheets).
+        # Store baru disimpan setelah MongoDB sukses, kalau gagal baris yang sama dikirim ulang
+        sync = sync_worksheet(sheet, "history_film", commit=False)
+        print(f"   ✅ Sync Google Sheets: {sync.summary()}")
         
     except Exception as e:
         print(f"   ❌ Gagal koneksi ke Google Sheets: {e}")
@@ -43,14 +47,29 @@ def seed_data_from_cloud():
         db = mongo_client[DB_NAME]
         collection = db[COLLECTION_NAME]
         
-        collection.delete_many({}) 
+        row_numbers = sync.changed
+        if collection.count_documents({'_row': {'$exists': True}}, limit=1) == 0:
+            # MongoDB masih kosong / berisi data lama tanpa _row -> isi ulang penuh dari store
+            collection.delete_many({})
+            row_numbers = sorted(int(n) for n in sync.rows)
         
-        if data:
-            collection.insert_many(data)
-            print(f"   ✅ SUKSES! {len(data)} data tersimpan di MongoDB Local.")
-            print("   Sekarang MongoDB berisi data history tontonan Anda.")
-        else:
+        if not sync.rows:
             print("   ⚠️ Data di Sheet kosong.")
+        
+        # Upsert per baris sheet (key _row), sama seperti get_all_records: angka dikonversi
+        operations = [
+            ReplaceOne({'_row': n}, {'_row': n, **dict(zip(sync.header, numericise_all(sync.rows[str(n)])))}, upsert=True)
+            for n in row_numbers
+        ]
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+        if sync.removed:
+            collection.delete_many({'_row': {'$in': sync.removed}})
+        collection.create_index('_row', unique=True)
+        sync.commit()
+        
+        print(f"   ✅ SUKSES! {len(operations)} data di-upsert, {len(sync.removed)} dihapus di MongoDB Local.")
+        print("   Sekarang MongoDB berisi data history tontonan Anda.")
             
     except Exception as e:
         print(f"   ❌ Gagal koneksi ke MongoDB: {e}")
@@ -0,0 +1,199 @@
+import os
+import json
+import hashlib
+from gspread.utils import rowcol_to_a1
+from versioning import atomic_write
+
+# --- KONFIGURASI ---
+SHEETS_STORE_PATH = os.path.join('bronze_layer', '_sheets')  # Store bronze per sheet, key = nomor baris
+
+# 0 (default) = setiap sheet berubah, baca semua nilai (satu get_values, biayanya sama dengan
+# satu batch_get) lalu hash semua baris -> edit di baris lama (mis. update Progress) selalu terkirim.
+# > 0 = opt-in untuk sheet sangat besar: hanya N baris terakhir + baris baru yang dibaca ulang,
+# edit di atasnya baru tertangkap saat resync penuh berikutnya.
+EDIT_WINDOW = int(os.getenv('SHEETS_EDIT_WINDOW', '0'))
+# Mode EDIT_WINDOW saja: tiap N sync incremental, baca penuh sekali
+FULL_RESYNC_EVERY = int(os.getenv('SHEETS_FULL_RESYNC_EVERY', '24'))
+
+
+def row_hash(values):
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def pad_row(values, width):
+    """API Sheets memotong sel kosong di ujung baris -> samakan panjangnya dengan header."""
+    values = list(values[:width])
+    return values + [''] * (width - len(values))
+
+
+def load_store(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_store(path, store):
+    # Poller daemon & ingestion cron bisa sync sheet yang sama bersamaan -> temp file unik
+    atomic_write(path, lambda tmp_path: _dump_store(tmp_path, store))
+
+
+def _dump_store(path, store):
+    with open(path, 'w') as f:
+        json.dump(store, f, ensure_ascii=False)
+
+
+def header_row(row):
+    """Header tanpa sel kosong di ujung (get_values mengisi '' sampai kolom terlebar, batch_get tidak)."""
+    header = list(row)
+    while header and header[-1] == '':
+        header.pop()
+    return header
+
+
+def key_values(key_column, first_row, last_row):
+    """Nilai kolom A untuk baris first_row..last_row (sel kosong / di luar data -> '')."""
+    keys = [row[0] if row else '' for row in key_column[first_row - 1:last_row]]
+    return keys + [''] * (last_row - first_row + 1 - len(keys))
+
+
+def key_column_drift(key_column, rows, last_row):
+    """
+    Bandingkan checksum kolom A di sheet dengan store untuk baris 2..last_row (di atas EDIT_WINDOW).
+    Baris disisipkan / dihapus di tengah sheet menggeser kolom A -> checksum beda -> store
+    berkunci nomor baris tidak bisa dipercaya lagi dan harus dibaca penuh.
+    """
+    if last_row < 2:
+        return False
+    stored = [(rows.get(str(n)) or [''])[0] for n in range(2, last_row + 1)]
+    return row_hash(key_values(key_column, 2, last_row)) != row_hash(stored)
+
+
+def spreadsheet_modified_time(worksheet):
+    """lastUpdateTime dari Drive; None kalau tidak tersedia (maka selalu cek isi sheet)."""
+    try:
+        return worksheet.spreadsheet.get_lastUpdateTime()
+    except Exception:
+        return None
+
+
+class SheetSyncResult:
+    def __init__(self, mode, header, rows, changed, removed, api_calls, pending_store=None):
+        self.mode = mode          # 'unchanged' | 'incremental' | 'full'
+        self.header = header
+        self.rows = rows          # {nomor_baris: [nilai...]} -> seluruh isi store
+        self.changed = changed    # nomor baris yang baru / berubah di sync ini
+        self.removed = removed    # nomor baris yang hilang (sheet memendek)
+        self.api_calls = api_calls
+        self.pending_store = pending_store  # (path, store) yang belum disimpan
+
+    def commit(self):
+        """
+        Simpan store baru. Panggil SETELAH tujuan (mis. MongoDB) sukses ditulis: kalau gagal,
+        store lama tetap ada sehingga sync berikutnya mengirim ulang baris yang sama.
+        """
+        if self.pending_store:
+            save_store(*self.pending_store)
+            self.pending_store = None
+
+    def records(self, row_numbers=None):
+        """List dict header -> nilai (seperti get_all_records, tapi tanpa konversi angka)."""
+        numbers = sorted(self.rows, key=int) if row_numbers is None else row_numbers
+        return [dict(zip(self.header, self.rows[str(n)])) for n in numbers]
+
+    def summary(self):
+        return (f"mode {self.mode}, {len(self.rows)} baris, {len(self.changed)} baru/berubah, "
+                f"{len(self.removed)} hilang, {self.api_calls} panggilan API")
+
+
+def sync_worksheet(worksheet, store_name, store_path=SHEETS_STORE_PATH,
+                   edit_window=EDIT_WINDOW, full_resync_every=FULL_RESYNC_EVERY, commit=True):
+    """
+    Sinkronisasi satu worksheet ke store bronze berkunci nomor baris.
+
+    1. lastUpdateTime sama dengan sync terakhir -> selesai (1 panggilan Drive, 0 Sheets)
+    2. Default (edit_window 0): baca semua nilai dengan satu get_values
+    3. edit_window > 0: batch_get header + kolom A untuk deteksi baris sisipan / hapusan;
+       header berubah / kolom A bergeser / jadwal resync -> baca penuh, selain itu hanya
+       rentang edit_window terakhir s/d ujung grid (satu batch_get)
+    Jumlah baris diambil dari rentang terpakai (API membuang baris kosong di ujung), bukan
+    panjang kolom A, jadi baris yang kolom A-nya kosong tetap ikut.
+    Baris yang hash-nya sama dengan store tidak dianggap berubah.
+    commit=False: store baru baru disimpan lewat result.commit().
+    """
+    path = os.path.join(store_path, f"{store_name}.json")
+    store = load_store(path)
+    api_calls = 0
+
+    # --- 1. Gate metadata ---
+    modified_time = spreadsheet_modified_time(worksheet)
+    api_calls += 1
+    if store and modified_time and store.get('modified_time') == modified_time:
+        return SheetSyncResult('unchanged', store['header'], store['rows'], [], [], api_calls)
+
+    # --- 2. Header + kolom A (cek pergeseran baris, hanya mode edit_window) ---
+    full = store is None or edit_window <= 0 or store.get('runs_since_full', 0) >= full_resync_every
+    header = None
+    if not full:
+        header_range, key_column = worksheet.batch_get(['1:1', 'A:A'])
+        api_calls += 1
+        header = header_row(header_range[0]) if header_range else []
+        first_row = max(2, store['row_count'] + 2 - edit_window)
+        full = (
+            not header
+            or store.get('header') != header
+            or key_column_drift(key_column, store['rows'], first_row - 1)
+        )
+
+    # --- 3. Ambil baris (penuh atau hanya rentang ekor) ---
+    fetched = {}
+    if full:
+        values = worksheet.get_values()
+        api_calls += 1
+        header = header_row(values[0]) if values else []
+        values = values[1:]
+        first_row = 2
+    else:
+        # Sampai ujung grid (row_count): baris kosong di ujung tidak dikirim API,
+        # jadi panjang hasilnya = jumlah baris terpakai di rentang ini
+        last_row = max(worksheet.row_count, first_row)
+        cell_range = f"{rowcol_to_a1(first_row, 1)}:{rowcol_to_a1(last_row, len(header))}"
+        (values,) = worksheet.batch_get([cell_range])
+        api_calls += 1
+    for offset, row in enumerate(values):
+        fetched[str(first_row + offset)] = pad_row(row, len(header))
+    data_rows = first_row - 2 + len(values)
+
+    # --- 4. Bandingkan hash per baris ---
+    old_rows = {} if store is None or store.get('header') != header else store['rows']
+    old_hashes = {} if store is None or store.get('header') != header else store['hashes']
+    rows = {} if full else dict(old_rows)
+    hashes = {} if full else dict(old_hashes)
+    changed = []
+    for number, values in fetched.items():
+        digest = row_hash(values)
+        if old_hashes.get(number) != digest:
+            changed.append(int(number))
+        rows[number] = values
+        hashes[number] = digest
+
+    previous_rows = store['rows'] if store else {}
+    removed = sorted(int(n) for n in previous_rows if int(n) > data_rows + 1)
+    for number in removed:
+        rows.pop(str(number), None)
+        hashes.pop(str(number), None)
+
+    new_store = {
+        'header': header,
+        'row_count': data_rows,
+        'modified_time': modified_time,
+        'runs_since_full': 0 if full else store.get('runs_since_full', 0) + 1,
+        'rows': rows,
+        'hashes': hashes,
+    }
+    result = SheetSyncResult('full' if full else 'incremental', header, rows, sorted(changed), removed,
+                             api_calls, pending_store=(path, new_store))
+    if commit:
+        result.commit()
+    return result
@@ -0,0 +1,144 @@
+import re
+import unicodedata
+from collections import defaultdict
+from genre_resolver import edit_similarity
+
+# --- KONFIGURASI ---
+TITLE_FUZZY_THRESHOLD = 0.85
+YEAR_TOLERANCE = 1  # Tahun rilis TMDB vs tahun yang ditulis di history boleh beda 1 (rilis festival, dsb.)
+BLOCK_PREFIX = 3
+
+YEAR_PATTERN = re.compile(r'[\(\[]\s*((?:19|20)\d{2})\s*[\)\]]')
+LEADING_ARTICLE = re.compile(r'^(?:the|a|an)\s+')
+TRAILING_ARTICLE = re.compile(r',\s*(?:the|a|an)$')
+
+# Angka romawi sebagai nomor sekuel. 'i', 'v', 'x' tunggal tidak ikut: terlalu sering
+# berupa kata biasa ("I, Robot", "V for Vendetta", "X-Men")
+ROMAN_NUMERALS = {
+    'ii': 2, 'iii': 3, 'iv': 4, 'vi': 6, 'vii': 7, 'viii': 8, 'ix': 9, 'xi': 11, 'xii': 12,
+    'xiii': 13, 'xiv': 14, 'xv': 15, 'xvi': 16, 'xvii': 17, 'xviii': 18, 'xix': 19, 'xx': 20,
+}
+
+
+def normalize_title(title):
+    """
+    'Amélie (2001)' -> ('amelie', 2001), 'The Matrix' -> ('matrix', None).
+    Huruf kecil, aksen dibuang (NFKD), tanda baca jadi spasi, artikel depan dibuang.
+    """
+    if title is None or (isinstance(title, float) and title != title):
+        return '', None
+    text = str(title)
+
+    year = None
+    match = YEAR_PATTERN.search(text)
+    if match:
+        year = int(match.group(1))
+        text = YEAR_PATTERN.sub(' ', text)
+
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower().strip()
+    text = TRAILING_ARTICLE.sub('', text)            # "Matrix, The" -> "matrix"
+    text = text.replace('&', ' and ')
+    text = re.sub(r"['’`]", '', text)                # "Don't" -> "dont" (bukan "don t")
+    text = re.sub(r'[^\w\s]|_', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = LEADING_ARTICLE.sub('', text)
+    return text, year
+
+
+def release_year(release_date):
+    match = re.match(r'((?:19|20)\d{2})', str(release_date or ''))
+    return int(match.group(1)) if match else None
+
+
+def blocking_keys(key):
+    """Awalan token pertama & token terpanjang: typo harus 'selamat' di salah satunya."""
+    tokens = key.split()
+    if not tokens:
+        return set()
+    return {f"f:{tokens[0][:BLOCK_PREFIX]}", f"l:{max(tokens, key=len)[:BLOCK_PREFIX]}"}
+
+
+def number_tokens(key):
+    """'avatar 2' -> [2], 'rocky iv' -> [4]: nomor sekuel harus sama persis, bukan sekadar mirip."""
+    numbers = []
+    for token in key.split():
+        if token.isdigit():
+            numbers.append(int(token))
+        elif token in ROMAN_NUMERALS:
+            numbers.append(ROMAN_NUMERALS[token])
+    return sorted(numbers)
+
+
+def years_compatible(a, b, tolerance=YEAR_TOLERANCE):
+    return a is None or b is None or abs(a - b) <= tolerance
+
+
+class TitleIndex:
+    """
+    Index judul TMDB: hash map judul ternormalisasi (exact) + blok untuk fuzzy.
+    Fuzzy hanya membandingkan judul dalam blok yang sama, jadi biaya per judul
+    history sebanding ukuran blok, bukan seluruh katalog TMDB.
+    """
+
+    def __init__(self, movies, threshold=TITLE_FUZZY_THRESHOLD):
+        # movies: iterable dict dengan id, title, release_date, popularity
+        self.threshold = threshold
+        self.exact = defaultdict(list)
+        self.blocks = defaultdict(set)
+        for movie in movies:
+            key, _ = normalize_title(movie['title'])
+            if not key:
+                continue
+            entry = (movie['id'], movie['title'], release_year(movie.get('release_date')), movie.get('popularity') or 0.0)
+            self.exact[key].append(entry)
+            for block in blocking_keys(key):
+                self.blocks[block].add(key)
+        self.comparisons = 0
+
+    @staticmethod
+    def _best(entries, year):
+        # Judul sama (remake, dsb.) -> utamakan tahun yang cocok, lalu yang paling populer
+        compatible = [e for e in entries if years_compatible(year, e[2])]
+        if not compatible:
+            return None
+        return max(compatible, key=lambda e: (year is not None and e[2] == year, e[3]))
+
+    def match(self, title):
+        """Return dict: tmdb_id, tmdb_title, match_type (exact/fuzzy/unmatched), match_score."""
+        key, year = normalize_title(title)
+        result = {'title_key': key, 'tmdb_id': None, 'tmdb_title': None, 'match_type': 'unmatched', 'match_score': 0.0}
+        if not key:
+            return result
+
+        # 1. Exact lewat hash index
+        entry = self._best(self.exact.get(key, []), year)
+        if entry:
+            result.update(tmdb_id=entry[0], tmdb_title=entry[1], match_type='exact', match_score=1.0)
+            return result
+
+        # 2. Fuzzy: kandidat dari blok yang sama saja, disaring panjang dulu (murah)
+        candidates = set()
+        for block in blocking_keys(key):
+            candidates |= self.blocks.get(block, set())
+
+        max_len_gap = len(key) * (1 - self.threshold) / self.threshold
+        numbers = number_tokens(key)
+        best_key, best_score = None, 0.0
+        for candidate in candidates:
+            if candidate == key or abs(len(candidate) - len(key)) > max_len_gap:
+                continue
+            # "Avatar 2" vs "Avatar 5" beda satu huruf tapi film lain
+            if number_tokens(candidate) != numbers:
+                continue
+            self.comparisons += 1
+            score = edit_similarity(key, candidate)
+            if score > best_score and self._best(self.exact[candidate], year):
+                best_key, best_score = candidate, score
+
+        if best_key is not None and best_score >= self.threshold:
+            entry = self._best(self.exact[best_key], year)
+            result.update(tmdb_id=entry[0], tmdb_title=entry[1], match_type='fuzzy', match_score=round(best_score, 3))
+        else:
+            result['match_score'] = round(best_score, 3)
+        return result
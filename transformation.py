@@ -1,7 +1,12 @@
 import pandas as pd
 import json
 import os
+import sys
 import ast
+from schemas import write_table
+from versioning import pipeline_lock
+from genre_resolver import GenreResolver, GENRE_UNRESOLVED_FILE
+from quality_rules import apply_quality_rules
 
 # --- KONFIGURASI PATH ---
 BRONZE_PATH = 'bronze_layer'
@@ -60,55 +65,73 @@ GENRE_MAP = {
     'superhero': 'Superhero'
 }
 
+_genre_resolver = None
+
+def get_genre_resolver():
+    # Dibuat sekali per proses (index trigram + cache dibaca dari disk)
+    global _genre_resolver
+    if _genre_resolver is None:
+        _genre_resolver = GenreResolver(GENRE_MAP)
+    return _genre_resolver
+
 def clean_genre_text(genre_string):
     """
     Fungsi canggih untuk membersihkan genre yang berantakan.
-    Contoh input: "Horor, komedi, Action"
-    Output: "Horror, Comedy, Action"
+    Contoh input: "Horor, komedy/Action"
+    Output: "Action, Comedy, Horror"
     """
     if pd.isna(genre_string) or genre_string == '':
         return 'Unknown'
     
-    # 1. Pisahkan berdasarkan koma (jika ada banyak genre)
-    parts = [g.strip().lower() for g in str(genre_string).split(',')]
-    
-    cleaned_parts = []
-    for p in parts:
-        # 2. Cek di kamus mapping, kalau tidak ada pakai aslinya tapi dikapitalisasi
-        clean_word = GENRE_MAP.get(p, p.title())
-        cleaned_parts.append(clean_word)
-        
-    # 3. Gabungkan kembali dan Hapus duplikat (misal: Comedy, Comedy -> Comedy)
-    return ', '.join(sorted(list(set(cleaned_parts))))
+    # Pisah (koma, /, ;, dan ...), exact match GENRE_MAP, lalu fuzzy + cache untuk typo
+    cleaned_parts = get_genre_resolver().resolve(genre_string)
+    return ', '.join(cleaned_parts) if cleaned_parts else 'Unknown'
 
 # --- 1. TRANSFORMASI HISTORY (Perbaikan Genre) ---
-def transform_history():
+def transform_history(bronze_path=BRONZE_PATH, silver_path=SILVER_PATH):
     print("\n[1/4] Transform: Cleaning History Film...")
     try:
-        df = pd.read_csv(f"{BRONZE_PATH}/raw_history_film.csv")
-        df = df.drop_duplicates(subset=['Nama Film'])
-        # Terapkan pembersihan genre
-        df['Genre_Clean'] = df['Genre'].apply(clean_genre_text)
+        df = pd.read_csv(f"{bronze_path}/raw_history_film.csv")
+        # Terapkan pembersihan genre (cukup sekali per nilai unik, bukan per baris)
+        resolver = get_genre_resolver()
+        resolver.reset_stats()  # Laporan unresolved hanya untuk run ini
+        unique_genres = df['Genre'].dropna().unique()
+        genre_lookup = {g: clean_genre_text(g) for g in unique_genres}
+        df['Genre_Clean'] = df['Genre'].map(genre_lookup).fillna('Unknown')
+        resolver.save()
+
+        # Laporkan token yang tetap tidak dikenali agar bisa ditambahkan ke GENRE_MAP.
+        # Pipeline utama -> cache/, backfill -> backfill_work/dt=.../ (tidak menimpa laporan live)
+        base_path = os.path.dirname(os.path.normpath(silver_path))
+        report_file = os.path.join(base_path, os.path.basename(GENRE_UNRESOLVED_FILE)) if base_path else GENRE_UNRESOLVED_FILE
+        unresolved = resolver.write_unresolved_report(report_file)
+        print(f"   🔎 Genre unik: {len(unique_genres)} | fuzzy baru: {resolver.fuzzy_lookups} | tidak dikenali: {len(unresolved)}")
+        for item in unresolved[:5]:
+            print(f"      ⚠️ '{item['token']}' (terdekat: {item['closest']}, skor {item['score']})")
         
         # Pilih kolom yang bersih saja
         df_clean = df[['Nama Film', 'Genre_Clean']].rename(columns={
             'Nama Film': 'title',
             'Genre_Clean': 'genres'
         })
+        # Judul kosong / duplikat -> karantina (dulu drop_duplicates diam-diam)
+        df_clean = apply_quality_rules(df_clean, 'dim_history_film', silver_path)
         
-        output = f"{SILVER_PATH}/dim_history_film.parquet"
-        df_clean.to_parquet(output, index=False)
+        output = f"{silver_path}/dim_history_film.parquet"
+        write_table(df_clean, 'dim_history_film', output)
         print(f"   ✅ Sukses: Genre dinormalisasi (Komedi -> Comedy). Simpan ke {output}")
         print(f"   👀 Contoh: {df_clean['genres'].iloc[0]}")
+        return True
         
     except Exception as e:
         print(f"   ❌ Gagal History: {e}")
+        return False
 
 # --- 2. TRANSFORMASI TUGAS (Perbaikan Progress & Tanggal) ---
-def transform_tugas():
+def transform_tugas(bronze_path=BRONZE_PATH, silver_path=SILVER_PATH):
     print("\n[2/4] Transform: Cleaning Data Tugas...")
     try:
-        df = pd.read_csv(f"{BRONZE_PATH}/raw_tugas_kesibukan.csv")
+        df = pd.read_csv(f"{bronze_path}/raw_tugas_kesibukan.csv")
         
         # 1. HAPUS DUPLIKAT BARIS (Kalau ada baris kembar persis, sisakan 1)
         initial_count = len(df)
@@ -133,10 +156,6 @@ def transform_tugas():
         # 5. Tanggal (Day First)
         df['deadline_clean'] = pd.to_datetime(df['Deadline'], dayfirst=True, errors='coerce')
         
-        # 6. Filter Sampah (Jam negatif atau Tanggal Error)
-        df = df[df['deadline_clean'].notna()]  # Buang yang tanggalnya ngaco
-        df = df[df['estimation_hours'] > 0]    # Buang jam 0 atau minus
-
         # Rename
         df_clean = df.rename(columns={
             'Nama Tugas': 'task_name',
@@ -144,28 +163,33 @@ def transform_tugas():
             'Tipe Beban': 'load_type'
         })
         
+        # 6. Rule kualitas: tanggal error / jam <= 0 dikarantina beserta kolom mentahnya (bukan dibuang diam-diam)
+        df_clean = apply_quality_rules(df_clean, 'dim_tasks', silver_path)
+
         # Pilih kolom final
         final_cols = ['task_name', 'estimation_hours', 'progress_clean', 'deadline_clean', 'category', 'load_type']
         df_final = df_clean[final_cols]
         
-        output = f"{SILVER_PATH}/dim_tasks.parquet"
-        df_final.to_parquet(output, index=False)
+        output = f"{silver_path}/dim_tasks.parquet"
+        write_table(df_final, 'dim_tasks', output)
         print(f"   ✅ Sukses: Data Tugas Bersih (No Duplicate, Standard Category).")
+        return True
         
     except Exception as e:
         print(f"   ❌ Gagal Tugas: {e}")
+        return False
 
 # --- 3. TRANSFORMASI CALENDAR (Flatten JSON) ---
-def transform_calendar():
+def transform_calendar(bronze_path=BRONZE_PATH, silver_path=SILVER_PATH):
     print("\n[3/4] Transform: Cleaning Calendar...")
     try:
-        with open(f"{BRONZE_PATH}/raw_calendar_events.json", 'r') as f:
+        with open(f"{bronze_path}/raw_calendar_events.json", 'r') as f:
             data = json.load(f)
             
         # Normalisasi JSON (Meratakan struktur nested)
         if not data:
             print("   ⚠️ Data Calendar Kosong.")
-            return
+            return True
 
         cleaned_events = []
         for event in data:
@@ -179,54 +203,71 @@ def transform_calendar():
             cleaned_events.append({
                 'event_title': summary,
                 'start_time': start,
-                'end_time': end
+                'end_time': end,
+                # Event seharian hanya punya 'date' (tanpa jam & zona waktu)
+                'is_all_day': 'dateTime' not in event.get('start', {})
             })
             
         df = pd.DataFrame(cleaned_events)
         
         # Pastikan format tanggal dikenali komputer
-        df['start_time'] = pd.to_datetime(df['start_time'], utc=True)
-        df['end_time'] = pd.to_datetime(df['end_time'], utc=True)
+        # ISO8601: campuran 'dateTime' (2025-12-03T09:00:00+07:00) & 'date' seharian (2025-12-03),
+        # tanpa format eksplisit pandas menebak dari nilai pertama lalu gagal di nilai lain
+        df['start_time'] = pd.to_datetime(df['start_time'], utc=True, format='ISO8601')
+        df['end_time'] = pd.to_datetime(df['end_time'], utc=True, format='ISO8601')
+        df = apply_quality_rules(df, 'dim_calendar', silver_path)
         
-        output = f"{SILVER_PATH}/dim_calendar.parquet"
-        df.to_parquet(output, index=False)
+        output = f"{silver_path}/dim_calendar.parquet"
+        write_table(df, 'dim_calendar', output)
         print(f"   ✅ Sukses: JSON diratakan. Simpan ke {output}")
+        return True
         
     except Exception as e:
         print(f"   ❌ Gagal Calendar: {e}")
+        return False
 
 # --- 4. TRANSFORMASI TMDB (Select Columns) ---
-def transform_tmdb():
+def transform_tmdb(bronze_path=BRONZE_PATH, silver_path=SILVER_PATH):
     print("\n[4/4] Transform: Cleaning TMDB Movies...")
     try:
-        with open(f"{BRONZE_PATH}/raw_tmdb_movies.json", 'r') as f:
+        with open(f"{bronze_path}/raw_tmdb_movies.json", 'r') as f:
             data = json.load(f)
             
         df = pd.DataFrame(data)
         
         # Pilih kolom penting saja (Buang yang tidak perlu)
         wanted_cols = ['id', 'title', 'genre_ids', 'vote_average', 'popularity', 'release_date','overview']
-        # Pastikan kolom ada (kalau tidak ada, isi NaN)
-        for col in wanted_cols:
-            if col not in df.columns:
-                df[col] = None
-                
-        df_clean = df[wanted_cols].copy()
+        # Kolom yang hilang tetap dibuat (skema silver stabil), tapi dilaporkan & dicek rule not_null
+        missing_cols = [col for col in wanted_cols if col not in df.columns]
+        if missing_cols:
+            print(f"   ⚠️ Kolom TMDB tidak ada di bronze: {missing_cols}")
+        df_clean = df.reindex(columns=wanted_cols)
         
         # Konversi genre_ids (List angka) menjadi string (biar bisa disimpan di Parquet)
         df_clean['genre_ids'] = df_clean['genre_ids'].astype(str)
+        df_clean = apply_quality_rules(df_clean, 'dim_tmdb_movies', silver_path)
         
-        output = f"{SILVER_PATH}/dim_tmdb_movies.parquet"
-        df_clean.to_parquet(output, index=False)
+        output = f"{silver_path}/dim_tmdb_movies.parquet"
+        write_table(df_clean, 'dim_tmdb_movies', output)
         print(f"   ✅ Sukses: {len(df_clean)} film dibersihkan. Simpan ke {output}")
+        return True
         
     except Exception as e:
         print(f"   ❌ Gagal TMDB: {e}")
+        return False
 
 if __name__ == "__main__":
     print("--- 🥈 START SILVER LAYER TRANSFORMATION 🥈 ---")
-    transform_history()
-    transform_tugas()
-    transform_calendar()
-    transform_tmdb()
-    print("--- FINISHED ---")
\ No newline at end of file
+    # Jangan bentrok dengan daemon / run lain yang sedang menulis layer yang sama
+    with pipeline_lock():
+        results = [
+            transform_history(),
+            transform_tugas(),
+            transform_calendar(),
+            transform_tmdb(),
+        ]
+    print("--- FINISHED ---")
+    # Exit code != 0 agar run_pipeline.sh berhenti sebelum gold & publish
+    if not all(results):
+        print(f"❌ {results.count(False)} langkah silver gagal.")
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,203 @@
+import os
+import json
+import fcntl
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# --- KONFIGURASI PATH ---
+LAYERS = ['silver_layer', 'gold_layer']   # Folder kerja pipeline (ditulis transformation & gold)
+VERSIONS_PATH = 'lakehouse_versions'     # Snapshot read-only yang dibaca dashboard
+CURRENT_FILE = os.path.join(VERSIONS_PATH, 'CURRENT.json')
+MANIFEST_NAME = 'manifest.json'
+LOCK_FILE = os.path.join('cache', 'pipeline.lock')
+
+# Garbage collection: simpan N versi terbaru + versi yang masih muda (mungkin sedang dipin dashboard)
+KEEP_VERSIONS = int(os.getenv('KEEP_VERSIONS', '5'))
+GC_GRACE_MINUTES = int(os.getenv('VERSION_GC_GRACE_MINUTES', '120'))
+
+
+# --- 1. PENULISAN ATOMIK (Dipakai schemas.write_table) ---
+def atomic_write(path, write_fn):
+    """
+    Tulis file lewat path sementara lalu os.replace.
+    Selain mencegah pembaca melihat file setengah jadi, ini juga membuat inode baru,
+    sehingga file lama yang sudah di-hard-link ke versi terpublikasi tidak ikut berubah.
+    Nama sementara unik per panggilan: beberapa proses boleh menulis file yang sama
+    bersamaan (yang terakhir menang), tanpa saling menimpa / memindahkan .tmp milik lain.
+    """
+    folder = os.path.dirname(path) or '.'
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        write_fn(tmp_path)
+        os.chmod(tmp_path, 0o644)  # mkstemp membuat 0600; dashboard/container lain harus bisa membaca
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+@contextmanager
+def pipeline_lock(lock_file=LOCK_FILE):
+    """Kunci lintas proses (flock): hanya satu run silver/gold/publish yang menulis pada satu waktu."""
+    os.makedirs(os.path.dirname(lock_file), exist_ok=True)
+    with open(lock_file, 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# --- 2. MEMBACA POINTER VERSI ---
+def current_version():
+    """Id versi yang sedang dipublikasikan, atau None kalau belum pernah publish."""
+    try:
+        with open(CURRENT_FILE, 'r') as f:
+            return json.load(f)['version']
+    except (FileNotFoundError, KeyError, json.JSONDecodeError):
+        return None
+
+
+def version_exists(version):
+    return version is not None and os.path.isfile(os.path.join(VERSIONS_PATH, version, MANIFEST_NAME))
+
+
+def resolve_path(relpath, version=None):
+    """
+    Path fisik sebuah file layer (misal 'gold_layer/fact_genre_stats.parquet')
+    di dalam versi tertentu. Kalau belum ada versi, fallback ke folder kerja.
+    """
+    version = version or current_version()
+    if version_exists(version):
+        return os.path.join(VERSIONS_PATH, version, relpath)
+    return relpath
+
+
+def load_manifest(version):
+    with open(os.path.join(VERSIONS_PATH, version, MANIFEST_NAME), 'r') as f:
+        return json.load(f)
+
+
+# --- 3. PUBLISH (Snapshot zero-copy + pointer swap) ---
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Beda filesystem / tidak mendukung hard link -> salin biasa
+        shutil.copy2(src, dst)
+
+
+def iter_layer_files(layers=LAYERS):
+    for layer in layers:
+        for root, _, files in os.walk(layer):
+            for filename in sorted(files):
+                if filename.endswith('.parquet'):
+                    yield os.path.join(root, filename)
+
+
+def publish(layers=LAYERS):
+    """Bekukan isi folder kerja silver+gold menjadi satu versi, lalu pindahkan pointer CURRENT."""
+    os.makedirs(VERSIONS_PATH, exist_ok=True)
+    previous = current_version()
+    previous_files = load_manifest(previous)['files'] if version_exists(previous) else {}
+
+    version = datetime.now(timezone.utc).strftime('v%Y%m%dT%H%M%S%fZ')
+    staging_dir = os.path.join(VERSIONS_PATH, f"{version}.staging")
+    files = {}
+    reused = 0
+
+    for relpath in iter_layer_files(layers):
+        stat = os.stat(relpath)
+        old = previous_files.get(relpath)
+        old_path = os.path.join(VERSIONS_PATH, previous, relpath) if old else None
+
+        # Inode sama = file ini memang belum ditulis ulang sejak publish terakhir
+        if old and os.path.exists(old_path) and os.stat(old_path).st_ino == stat.st_ino:
+            sha = old['sha256']
+        else:
+            sha = file_sha256(relpath)
+
+        # Isi tidak berubah -> link ke file versi sebelumnya (inode yang sama, tanpa salin)
+        if old and old['sha256'] == sha and os.path.exists(old_path):
+            link_or_copy(old_path, os.path.join(staging_dir, relpath))
+            reused += 1
+        else:
+            link_or_copy(relpath, os.path.join(staging_dir, relpath))
+
+        files[relpath] = {'sha256': sha, 'size': stat.st_size}
+
+    manifest = {
+        'version': version,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'parent': previous,
+        'files': files,
+    }
+    os.makedirs(staging_dir, exist_ok=True)
+    with open(os.path.join(staging_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+    # Versi baru baru "terlihat" setelah rename folder + swap pointer (keduanya atomik)
+    os.rename(staging_dir, os.path.join(VERSIONS_PATH, version))
+    atomic_write(CURRENT_FILE, lambda tmp: _write_pointer(tmp, version))
+
+    print(f"   ✅ Publish versi {version}: {len(files)} file ({reused} tidak berubah, di-hard-link)")
+    return version
+
+
+def _write_pointer(path, version):
+    with open(path, 'w') as f:
+        json.dump({'version': version, 'published_at': datetime.now(timezone.utc).isoformat()}, f)
+
+
+# --- 4. GARBAGE COLLECTION VERSI LAMA ---
+def gc_versions(keep=KEEP_VERSIONS, grace_minutes=GC_GRACE_MINUTES):
+    if not os.path.isdir(VERSIONS_PATH):
+        return 0
+
+    current = current_version()
+    now = datetime.now(timezone.utc).timestamp()
+    names = sorted(
+        name for name in os.listdir(VERSIONS_PATH)
+        if os.path.isdir(os.path.join(VERSIONS_PATH, name)) and name.startswith('v')
+    )
+    published = [name for name in names if not name.endswith('.staging')]
+    staging = [name for name in names if name.endswith('.staging')]
+
+    # Kandidat hapus: versi di luar N terbaru + sisa staging dari publish yang gagal
+    candidates = (published[:-keep] if keep > 0 else published) + staging
+
+    removed = 0
+    for name in candidates:
+        path = os.path.join(VERSIONS_PATH, name)
+        age_minutes = (now - os.path.getmtime(path)) / 60
+        # Versi aktif & versi yang masih muda (mungkin sedang dipin dashboard) dipertahankan
+        if name == current or age_minutes < grace_minutes:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    print("--- 📦 START PUBLISH LAKEHOUSE VERSION 📦 ---")
+    with pipeline_lock():
+        publish()
+        removed = gc_versions()
+    print(f"   🧹 {removed} versi lama dihapus (simpan {KEEP_VERSIONS} terbaru).")
+    print("--- FINISHED ---")